@@ -1,17 +1,11 @@
-from scraper import scrape_presidents
 import database
+import refresh
 import streamlit as st
 
 
 def main():
-    database.reset_database()  # clear existing table
-    database.create_table()  # ensure the table is created
-
-    presidents = scrape_presidents()  # Get president data
-
-    # insert each president into the database
-    for president in presidents:
-        database.insert_president(president)
+    # scrape and load the presidents only when the stored data is stale
+    refresh.ensure_fresh()
 
     st.title("U.S. Presidents Trivia")
 
@@ -1,64 +1,187 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import requests
-from scraper import scrape_presidents
-from utils import parse_term_dates
+import database
+import dataset
+from utils import INCUMBENT_END, parse_term_dates
 
+# API url for events in a given year
+EVENTS_URL = "https://events.historylabs.io/year/{year}"
+MAX_WORKERS = 8  # most years of a term fetched at the same time
+REQUEST_TIMEOUT = 10  # seconds to wait for each request
+RETRIES = 2  # extra attempts after a failed request
+BACKOFF = 0.5  # seconds before the first retry, doubled after each one
+# seconds before a year that failed to load is requested again
+FAILURE_TTL = 3600
 
-def get_events(year):
+# years being fetched right now, so overlapping requests (e.g. from other
+# Streamlit sessions) wait for that fetch instead of starting another
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def should_retry(error):
+    # retry network problems and server errors, but not bad requests
+    response = getattr(error, "response", None)
+    return response is None or response.status_code >= 500
+
+
+def fetch_events(year, timeout=None, retries=None):
     # API url for the given year
-    URL = f"https://events.historylabs.io/year/{year}"
-    try:
-        response = requests.get(URL)  # make a request to get the events
-        response.raise_for_status()  # raise an error for bad status codes
-        return response.json()  # return the data from the response
-    except requests.exceptions.RequestException as e:
-        # if any errors occur during the request
-        print(f"Error fetching events for {year}: {e}")
+    URL = EVENTS_URL.format(year=year)
+    timeout = REQUEST_TIMEOUT if timeout is None else timeout
+    retries = RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            # make a request to get the events
+            response = requests.get(URL, timeout=timeout)
+            response.raise_for_status()  # raise an error for bad status codes
+            return response.json()  # return the data from the response
+        except requests.exceptions.RequestException as e:
+            if attempt == retries or not should_retry(e):
+                # if the request keeps failing or can't succeed
+                print(f"Error fetching events for {year}: {e}")
+                return None
+            # wait a little longer before each retry
+            time.sleep(BACKOFF * 2 ** attempt)
+
+
+def event_contents(data):
+    # Extract only the 'content' from each event, or None if the request
+    # failed (an empty list when there are no events)
+    if data is None:
         return None
+    return [event["content"] for event in data.get("events", [])]
+
+
+def get_events(year, timeout=None, retries=None):
+    # events for past years never change, so check the local cache first
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return None  # not a real year, so there are no events to fetch
+
+    cached = database.fetch_cached_events(year, year + 1, FAILURE_TTL)
+    if year in cached:
+        if cached[year] is None:
+            return None  # this year failed recently, don't ask again yet
+        return {"events": [{"content": content} for content in cached[year]]}
+
+    data = fetch_events(year, timeout, retries)
+    # cache the events, or remember the failure so it isn't retried at once
+    database.store_events({year: event_contents(data)})
+    return data
+
 
+def fetch_missing_events(years, max_workers=None):
+    # fetch years that aren't cached, at most max_workers at once, and
+    # return {year: [content, ...] or None}
+    max_workers = MAX_WORKERS if max_workers is None else max_workers
+    futures = {}
+    owned = []  # years this call fetches, the rest are already under way
+    with _in_flight_lock:
+        for year in years:
+            if year not in _in_flight:
+                _in_flight[year] = Future()
+                owned.append(year)
+            futures[year] = _in_flight[year]
 
-def get_events_for_term(term):
-    # parse the start and end years of the term
+    try:
+        if owned:
+            with ThreadPoolExecutor(max_workers=max(
+                    1, min(max_workers, len(owned)))) as executor:
+                fetched = {year: event_contents(data) for year, data
+                           in zip(owned, executor.map(fetch_events, owned))}
+            # cache everything that was fetched in one transaction
+            database.store_events(fetched)
+            for year in owned:
+                futures[year].set_result(fetched[year])
+    except BaseException as e:
+        for year in owned:
+            if not futures[year].done():
+                futures[year].set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            for year in owned:
+                del _in_flight[year]
+    return {year: futures[year].result() for year in years}
+
+
+def get_events_for_years(years, max_workers=None):
+    # returns {year: [content, ...]} for each year, in order, with each
+    # year looked up once no matter how many terms it belongs to
+    years = sorted(set(years))
+    if not years:
+        return {}
+
+    # read every cached year with a single query
+    cached = database.fetch_cached_events(years[0], years[-1] + 1,
+                                          FAILURE_TTL)
+    missing = [year for year in years if year not in cached]
+    if missing:
+        cached.update(fetch_missing_events(missing, max_workers))
+
+    # failed years come back as None, so show them as empty lists
+    return {year: cached[year] or [] for year in years}
+
+
+def get_events_for_range(start_year, end_year, max_workers=None):
+    # events for every year from start_year up to (not including) end_year
+    return get_events_for_years(range(start_year, end_year), max_workers)
+
+
+def term_years(term):
+    # the years from the start to end of the term (excluding the end year)
     start_year, end_year = parse_term_dates(term, True)
+    return range(start_year, end_year)
+
+
+def president_years(president):
+    # the years of a stored president's term, using the dates parsed when
+    # it was stored when they are there
+    if not president.term_start:
+        return term_years(president.term)
+    start_year = int(president.term_start[:4])
+    end_year = int((president.term_end or INCUMBENT_END)[:4])
+    return range(start_year, end_year)
+
 
-    # Create an empty dictionary to hold events for each year
-    events_by_year = {}
+def get_events_for_term(term, max_workers=None):
+    return get_events_for_years(term_years(term), max_workers)
 
-    # Loop through the range of years from the start to end
-    #  of the term (excluding the end year)
-    for year in range(start_year, end_year):
-        # Fetch events for the given year
-        data = get_events(year)
 
-        # Ensure we have events data before trying to process it
-        if data and "events" in data:
-            # Extract only the 'content' from each event and store it in a list
-            events_by_year[year] = [event["content"]
-                                    for event in data["events"]]
-        else:
-            # If no events are found, store an empty list
-            events_by_year[year] = []
-    # return the dictionary of events by year
-    return events_by_year
+def prefetch_events(max_workers=None):
+    # warm the cache for every year covered by a stored term
+    years = set()
+    for president in dataset.get_presidents():
+        years.update(president_years(president))
+    return get_events_for_years(years, max_workers)
 
 
 def get_events_for_president(president_name):
-    # scrape the list of all presidents and their info
-    presidents = scrape_presidents()
-    # filter the list to find presidents matching the given name
-    matching_presidents = [
-        pres for pres in presidents if pres["name"] == president_name]
+    # look up every record (one per term) stored for this name
+    matching_presidents = dataset.find_by_name(president_name)
     # if no matches are found
     if not matching_presidents:
         return None
+    # look up the years of every term together, so years shared by two
+    # terms are only looked up once
+    years_by_term = [president_years(president)
+                     for president in matching_presidents]
+    all_events = get_events_for_years(
+        year for years in years_by_term for year in years)
     # prepare the result dictionary with the president's name
     result = {"name": president_name, "terms": []}
     # loop through each matching president entry (to handle multiple terms)
-    for president in matching_presidents:
+    for president, years in zip(matching_presidents, years_by_term):
         # create a dictionary for the term and events
         term_events = {
-            "number": president["number"],  # term number
-            "term": president["term"],  # date of term
-            "events": get_events_for_term(president["term"])  # events by year
+            "number": president.number,  # term number
+            "term": president.term,  # date of term
+            # events by year
+            "events": {year: all_events[year] for year in years}
         }
         # add the term info to the result
         result["terms"].append(term_events)
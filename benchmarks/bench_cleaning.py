@@ -0,0 +1,77 @@
+"""Time each scraper cleaning function against the old uncompiled,
+multi-pass version on cell texts like the ones on the presidents page.
+
+Run from the repo root: python benchmarks/bench_cleaning.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scraper
+
+NUMBER = 20_000  # calls timed per function and cell
+CELLS = [
+    "George Washington[14]",
+    "April 30, 1789 – March 4, 1797",
+    "Whig[f] Unaffiliated",
+    "Democratic (United States)",
+    "1932193619401944",
+    "1788–89 1792",
+    "John Nance Garner1933–1941 Henry A. Wallace1941–1945 "
+    "Harry S. Truman1945",
+    "Thomas A. Hendricks[h] (Mar. 4 – Nov. 25, 1885) Office vacant",
+]
+
+
+def old_clean_text(text):
+    text = re.sub(r'\[.*?\]', '', text)
+    text = text.replace("\u00a0", " ").replace("\u2013", "-")
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'\(.*?\)', '', text)
+    return text.strip() or "N/A"
+
+
+def old_clean_vice_president(vp_text):
+    # scrape_presidents ran clean_text before clean_vice_president did again
+    vp_text = old_clean_text(vp_text)
+    return old_clean_text(re.sub(r'(?<=\D)(\d{4})', r' \1', vp_text))
+
+
+def old_clean_election(election):
+    election = election.replace("\u00a0", " ").replace("\u2013", " ")
+    return re.sub(r'(\d{4})(?=\d{4})', r'\1 ', election).strip() or "N/A"
+
+
+def old_birth_death_match(text):
+    return re.search(r'(b\.)?\s*(\d{4})\s*[\u2013-]?\s*(\d{4})?', text)
+
+
+FUNCTIONS = [
+    ("clean_text", old_clean_text, scraper.clean_text),
+    ("clean_vice_president", old_clean_vice_president,
+     scraper.clean_vice_president),
+    ("clean_election", old_clean_election, scraper.clean_election),
+    ("birth_death match", old_birth_death_match,
+     scraper.BIRTH_DEATH_RE.search),
+]
+
+
+def time_function(function):
+    # microseconds per call, averaged over the cells
+    seconds = sum(timeit.timeit(lambda: function(cell), number=NUMBER)
+                  for cell in CELLS)
+    return seconds / (NUMBER * len(CELLS)) * 1e6
+
+
+def main():
+    print(f"{len(CELLS)} cells, {NUMBER} calls each")
+    for name, old, new in FUNCTIONS:
+        old_us, new_us = time_function(old), time_function(new)
+        print(f"{name:>20}: old {old_us:6.2f} us  new {new_us:6.2f} us  "
+              f"({old_us / new_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare queries per second of fresh connections against the
+shared per-thread connection in database.py.
+
+Run from the repo root: python benchmarks/bench_database.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from models import President
+
+QUERIES = 2000  # queries issued by each thread
+THREADS = 8  # simulated concurrent Streamlit sessions
+
+
+def fresh_connection_query():
+    # the old pattern: connect, query, close on every call
+    conn = sqlite3.connect(database.DATABASE_NAME)
+    conn.execute("SELECT name FROM presidents ORDER BY number").fetchall()
+    conn.close()
+
+
+def shared_connection_query():
+    database.fetch_president_names()
+
+
+def run(query, threads):
+    # run QUERIES calls on each thread and return queries per second
+    def worker():
+        for _ in range(QUERIES):
+            query()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    return QUERIES * threads / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        database.create_table()
+        for number in range(1, 48):
+            database.insert_president(President(
+                number, "image_url", f"President {number}", "N/A", "N/A",
+                "None", "N/A", "N/A"))
+        for threads in (1, THREADS):
+            before = run(fresh_connection_query, threads)
+            after = run(shared_connection_query, threads)
+            print(f"{threads} thread(s): fresh connections {before:,.0f} q/s,"
+                  f" shared connection {after:,.0f} q/s"
+                  f" ({after / before:.1f}x)")
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
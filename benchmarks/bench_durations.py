@@ -0,0 +1,82 @@
+"""Time calculate_durations and the Visuals term parsing on a synthetic
+100k-row term table, against the old row-by-row dateutil versions.
+
+Run from the repo root: python benchmarks/bench_durations.py
+"""
+import os
+import random
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+
+ROWS = 100_000
+ROW_WISE_ROWS = 5_000  # the old versions are timed on fewer rows
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+
+def synthetic_terms(rows, seed=0):
+    # terms shaped like the scraped ones, a few of them still going on
+    rng = random.Random(seed)
+    terms = []
+    for _ in range(rows):
+        year = rng.randint(1789, 2020)
+        start = f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {year}"
+        if rng.random() < 0.02:
+            terms.append(f"{start} - Incumbent")
+        else:
+            end_year = year + rng.randint(0, 12)
+            terms.append(f"{start} - {rng.choice(MONTHS)} "
+                         f"{rng.randint(1, 28)}, {end_year}")
+    return pd.DataFrame({"name": [f"President {i}" for i in range(rows)],
+                         "term": terms})
+
+
+def row_wise_durations(df):
+    # the old utils.calculate_durations
+    durations = []
+    for _, row in df.iterrows():
+        start, end = utils.parse_term_dates(row["term"], True)
+        durations.append({"Name": row["name"], "Start": start, "End": end,
+                          "Years in Office": end - start})
+    return pd.DataFrame(durations)
+
+
+def row_wise_term_dates(df):
+    # the old pages/Visuals.parse_term_dates
+    df[["Start", "End"]] = df["term"].apply(
+        lambda t: pd.Series(utils.parse_term_dates(t)))
+    return df
+
+
+def vectorized_term_dates(df):
+    df["Start"], df["End"] = utils.parse_term_series(df["term"])
+    return df
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    func(df.copy())
+    return time.perf_counter() - start
+
+
+def main():
+    df = synthetic_terms(ROWS)
+    sample = df.head(ROW_WISE_ROWS)
+    for label, old, new in (
+            ("calculate_durations", row_wise_durations,
+             utils.calculate_durations),
+            ("term dates", row_wise_term_dates, vectorized_term_dates)):
+        # scale the row-wise time up to the full table size
+        old_time = timed(old, sample) * ROWS / ROW_WISE_ROWS
+        new_time = timed(new, df)
+        print(f"{label}: row-wise ~{old_time:.2f}s (estimated),"
+              f" vectorized {new_time:.3f}s for {ROWS:,} rows"
+              f" ({old_time / new_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
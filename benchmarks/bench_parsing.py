@@ -0,0 +1,84 @@
+"""Time the scraper's parser backends and measure their peak memory on a
+saved copy of the presidents page.
+
+Run from the repo root: python benchmarks/bench_parsing.py [saved_page.html]
+
+Without a saved page a synthetic one is used: the presidents table surrounded
+by enough unrelated markup to be about the size of the real article.
+"""
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scraper
+
+ROUNDS = 5  # parses timed per backend
+FILLER_SECTIONS = 400  # unrelated sections in the synthetic page
+
+
+def president_row(number):
+    return (f"<tr><th>{number}</th>"
+            f'<td><img src="//upload.wikimedia.org/p{number}.jpg"/></td>'
+            f'<td><b>President {number}</b><br/><span style="font-size: 85%;">'
+            f"b. 1732 – 1799</span></td>"
+            f"<td>April 30, 1789 – March 4, 1797</td>"
+            f'<td style="background-color:#ccc"></td><td>Party {number}</td>'
+            f"<td>1788 1792</td><td>Vice President {number}</td></tr>")
+
+
+def synthetic_page():
+    # the real article is mostly navigation, references and other tables
+    filler = "".join(
+        f'<div class="section"><h2 id="s{i}">Section {i}</h2><p>Text with '
+        f'<a href="/wiki/{i}">a link</a><sup>[{i}]</sup>.</p>'
+        f'<table class="infobox"><tr><td>{i}</td></tr></table></div>'
+        for i in range(FILLER_SECTIONS))
+    rows = "".join(president_row(number) for number in range(1, 48))
+    return (f"<html><head><title>Presidents</title></head><body>{filler}"
+            f'<table class="wikitable sortable"><tr><th>No.</th></tr>{rows}'
+            f"</table>{filler}</body></html>")
+
+
+def measure(html, backend):
+    # records, mean parse time and peak traced memory for one backend
+    response = type("Response", (), {"status_code": 200, "text": html})
+    with patch.object(scraper.http_cache, "cached_get",
+                      return_value=response):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            records = scraper.scrape_presidents(backend=backend)
+        elapsed = (time.perf_counter() - start) / ROUNDS
+        tracemalloc.start()
+        scraper.scrape_presidents(backend=backend)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return records, elapsed, peak
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_page()
+    print(f"page: {len(html) / 1024:.0f} KiB, {ROUNDS} rounds")
+
+    baseline = None
+    for backend, (features, _) in scraper.PARSER_BACKENDS.items():
+        if features == "lxml" and importlib.util.find_spec("lxml") is None:
+            print(f"{backend:>14}: skipped, lxml is not installed")
+            continue
+        records, elapsed, peak = measure(html, backend)
+        if baseline is None:
+            baseline = records
+        same = "same" if records == baseline else "DIFFERENT"
+        print(f"{backend:>14}: {elapsed * 1000:8.1f} ms  "
+              f"peak {peak / 2**20:6.1f} MiB  {len(records)} records ({same})")
+
+
+if __name__ == "__main__":
+    main()
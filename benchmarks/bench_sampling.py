@@ -0,0 +1,61 @@
+"""Compare the old full-table question sampling (fetch every row, then
+ORDER BY RANDOM() for the wrong answers) against the primary key seeks
+in database.py, for growing table sizes.
+
+Run from the repo root: python benchmarks/bench_sampling.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from models import President
+
+QUESTIONS = 500  # questions sampled per measurement
+
+
+def full_table_question(rng):
+    # the old fetch_random_president + fetch_wrong_presidents
+    cursor = database.get_connection().cursor()
+    cursor.execute("SELECT name, picture, birth_death, term, party,"
+                   " election, vice_president FROM presidents")
+    president = rng.choice(cursor.fetchall())
+    cursor.execute("SELECT name FROM presidents WHERE name != ? ORDER BY "
+                   "RANDOM() LIMIT 3", (president[0],))
+    return cursor.fetchall()
+
+
+def seek_question(rng):
+    president = database.fetch_random_president(rng)
+    return database.fetch_wrong_presidents(president["name"], rng=rng)
+
+
+def questions_per_second(question, rng):
+    start = time.perf_counter()
+    for _ in range(QUESTIONS):
+        question(rng)
+    return QUESTIONS / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        database.create_table()
+        for size in (47, 10_000, 100_000):
+            database.bulk_upsert_presidents(
+                President(number, "image_url", f"President {number}",
+                          "N/A", "N/A", "None", "N/A", "N/A")
+                for number in range(1, size + 1))
+            before = questions_per_second(full_table_question,
+                                          random.Random(0))
+            after = questions_per_second(seek_question, random.Random(0))
+            print(f"{size:>7,} presidents: full table {before:,.0f} q/s,"
+                  f" primary key seeks {after:,.0f} q/s")
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare reading questions from the database file against the in-memory
+snapshot mode, with many threads calling fetch_question at once.
+
+Run from the repo root: python benchmarks/bench_snapshot.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from models import President
+
+PRESIDENTS = 47
+QUESTIONS = 500  # questions fetched by each thread
+THREAD_COUNTS = (1, 4, 16, 64)
+
+
+def run_threads(thread_count):
+    # questions per second with thread_count threads reading at once
+    start_line = threading.Barrier(thread_count + 1)
+
+    def ask():
+        start_line.wait()
+        for _ in range(QUESTIONS):
+            database.fetch_question()
+
+    threads = [threading.Thread(target=ask) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return thread_count * QUESTIONS / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        database.DATABASE_NAME = os.path.join(directory, "presidents.db")
+        database.create_table()
+        database.sync_presidents(
+            President(number, "image_url", f"President {number}", "N/A",
+                      "N/A", "None", "N/A", "N/A")
+            for number in range(1, PRESIDENTS + 1))
+        database.set_metadata({"refreshed_at": time.time()})
+
+        print(f"{PRESIDENTS} presidents, {QUESTIONS} questions per thread")
+        for thread_count in THREAD_COUNTS:
+            database.use_snapshot(False)
+            on_disk = run_threads(thread_count)
+            database.use_snapshot()
+            in_memory = run_threads(thread_count)
+            print(f"{thread_count:>3} threads: file {on_disk:9.0f} q/s  "
+                  f"snapshot {in_memory:9.0f} q/s  "
+                  f"({in_memory / on_disk:.1f}x)")
+        database.use_snapshot(False)
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,1287 @@
+import atexit
+import functools
+import hashlib
+import itertools
+import json
+import os
+import re
 import sqlite3
+import threading
+import time
 import pandas as pd
 import random
+import utils
+from models import President
 
 DATABASE_NAME = "presidents.db"  # name of the databse file
 
+# pragmas applied to every new connection: WAL lets readers run while a
+# writer is active, and NORMAL sync is safe under WAL and much cheaper
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA foreign_keys=ON",
+)
+BUSY_TIMEOUT = 5.0  # seconds to wait on a locked database
 
+# random number generator for questions, seed it (or pass your own to
+# the fetch functions) for reproducible questions
+RNG = random.Random()
+
+_local = threading.local()  # one cached connection per thread
+_connections = {}  # every open connection by thread, to close them all
+_connections_lock = threading.Lock()
+_generation = 0  # bumped by close_connections to invalidate every thread
+
+# optional shared in-memory copy of the database serving the reads (see
+# use_snapshot), on at startup with PRESIDENTS_DB_SNAPSHOT=1
+SNAPSHOT_CHECK_INTERVAL = 2.0  # seconds between checks of the stamps
+# metadata keys whose change on disk makes the snapshot reload: when the
+# presidents were refreshed and when portraits were last stored
+SNAPSHOT_STAMP_KEYS = ("refreshed_at", "written_at")
+_snapshot_enabled = os.environ.get("PRESIDENTS_DB_SNAPSHOT") == "1"
+_snapshot = None  # (uri, connection keeping it alive, refresh stamp)
+_snapshot_lock = threading.Lock()
+_snapshot_checked_at = 0.0
+_snapshot_dirty = False  # set by writes in this process
+_snapshot_ids = itertools.count()
+_snapshot_connections = {}  # every open snapshot connection by thread
+
+PRESIDENTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS presidents (
+        number INTEGER PRIMARY KEY,
+        picture TEXT,
+        name TEXT,
+        birth_death TEXT,
+        term TEXT,
+        party TEXT,
+        election TEXT,
+        vice_president TEXT,
+        term_start TEXT,
+        term_end TEXT,
+        is_incumbent INTEGER,
+        content_hash TEXT
+    )
+'''
+# columns parsed from the term when a president is stored: ISO start and
+# end dates (no end date while in office) and whether they are in office
+TERM_COLUMNS = {"term_start": "TEXT", "term_end": "TEXT",
+                "is_incumbent": "INTEGER"}
+# columns added to the presidents table after it was first created
+ADDED_COLUMNS = {**TERM_COLUMNS, "content_hash": "TEXT"}
+# columns of the presidents table, in order: the fields of a President
+PRESIDENT_COLUMNS = President._fields
+# every stored column: the president's columns plus a hash of their values
+STORED_COLUMNS = PRESIDENT_COLUMNS + ("content_hash",)
+INSERT_PRESIDENT_SQL = (
+    f"INSERT INTO presidents ({', '.join(STORED_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(STORED_COLUMNS))})")
+# overwrite a stored president with new values
+SET_PRESIDENT_SQL = " ".join([
+    INSERT_PRESIDENT_SQL, "ON CONFLICT(number) DO UPDATE SET",
+    ", ".join(f"{column} = excluded.{column}"
+              for column in STORED_COLUMNS[1:])])
+# the WHERE clause turns unchanged rows into no-ops
+UPSERT_PRESIDENT_SQL = (
+    SET_PRESIDENT_SQL + " WHERE content_hash IS NOT excluded.content_hash")
+# secondary indexes on the presidents table and the column each covers
+# (queries by year use the vice_presidents and elections tables instead)
+PRESIDENT_INDEXES = {
+    "presidents_name": "name",
+    "presidents_party": "party",
+}
+# a rebuild fills SHADOW_TABLE and swaps it in, keeping the table it
+# replaced as PREVIOUS_TABLE so the swap can be rolled back
+SHADOW_TABLE = "presidents_new"
+PREVIOUS_TABLE = "presidents_old"
+
+
+def _open_connection(path):
+    """Open a new connection to path with the tuned pragmas applied."""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT,
+                           check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _connections_lock:
+        # close connections left behind by threads that have finished
+        finished = [thread for thread in _connections
+                    if not thread.is_alive()]
+        for thread in finished:
+            _connections.pop(thread).close()
+        _connections[threading.current_thread()] = conn
+    return conn
+
+
+def _close(conn):
+    """Close this thread's connection and forget about it."""
+    with _connections_lock:
+        if _connections.get(threading.current_thread()) is not conn:
+            return  # already closed by close_connections
+        del _connections[threading.current_thread()]
+    conn.close()
+
+
+def get_connection():
+    """Return this thread's connection to the database, reusing it
+    across calls and reopening it if the database file was replaced."""
+    path = DATABASE_NAME
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        inode = None
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        # reuse the connection only if it still points at the same file
+        if _local.key == (path, inode, _generation):
+            return conn
+        _close(conn)
+    conn = _open_connection(path)
+    _local.conn = conn
+    _local.key = (path, os.stat(path).st_ino, _generation)
+    return conn
+
+
+def close_connections():
+    """Close every cached connection (e.g. before deleting the file)."""
+    global _generation
+    with _connections_lock:
+        connections = list(_connections.values())
+        connections += _snapshot_connections.values()
+        _connections.clear()
+        _snapshot_connections.clear()
+        _generation += 1
+    for conn in connections:
+        conn.close()
+    _drop_snapshot()
+
+
+def use_snapshot(enabled=True):
+    """Serve reads from an in-memory copy of the database, reloaded when
+    the database is refreshed, or go back to reading the file."""
+    global _snapshot_enabled
+    _snapshot_enabled = enabled
+    if not enabled:
+        _drop_snapshot()
+
+
+def _drop_snapshot():
+    """Forget the current snapshot; it is freed once no thread uses it."""
+    global _snapshot
+    with _snapshot_lock:
+        snapshot, _snapshot = _snapshot, None
+    if snapshot is not None:
+        snapshot[1].close()
+
+
+def _refresh_stamp():
+    # what a snapshot was loaded from: the file and its last writes
+    values = get_metadata_values(SNAPSHOT_STAMP_KEYS)
+    return DATABASE_NAME, *(values.get(key) for key in SNAPSHOT_STAMP_KEYS)
+
+
+def _load_snapshot():
+    """Copy the database into a new shared in-memory database with the
+    backup API, returning (uri, connection keeping it alive, stamp)."""
+    uri = (f"file:presidents_snapshot_{next(_snapshot_ids)}"
+           "?mode=memory&cache=shared")
+    # read the stamp before copying, so a refresh that happens during the
+    # copy is noticed on the next check
+    stamp = _refresh_stamp()
+    holder = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    get_connection().backup(holder)
+    return uri, holder, stamp
+
+
+def _current_snapshot():
+    """Return the current snapshot, loading a new one if there is none
+    yet, this process wrote to the database, or the stamps on disk
+    (SNAPSHOT_STAMP_KEYS) changed because another process refreshed or
+    stored portraits (checked every SNAPSHOT_CHECK_INTERVAL seconds)."""
+    global _snapshot, _snapshot_checked_at, _snapshot_dirty
+    snapshot = _snapshot
+    recently_checked = (
+        time.monotonic() - _snapshot_checked_at < SNAPSHOT_CHECK_INTERVAL)
+    if snapshot is not None and not _snapshot_dirty and recently_checked:
+        return snapshot  # fast path, recently checked
+    with _snapshot_lock:
+        old = _snapshot
+        if old is None or _snapshot_dirty or _refresh_stamp() != old[2]:
+            # writes from here on mark the new snapshot dirty again
+            _snapshot_dirty = False
+            _snapshot = _load_snapshot()
+            if old is not None:
+                old[1].close()  # readers still using it keep it alive
+        _snapshot_checked_at = time.monotonic()
+        return _snapshot
+
+
+def _invalidates_snapshot(func):
+    """Mark the snapshot out of date once func has written to the
+    database."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _snapshot_dirty
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _snapshot_dirty = True
+    return wrapper
+
+
+def get_read_connection():
+    """Return the connection reads should use: this thread's connection
+    to the in-memory snapshot in snapshot mode, otherwise the same
+    connection as get_connection."""
+    if not _snapshot_enabled:
+        return get_connection()
+    uri = _current_snapshot()[0]
+    conn = getattr(_local, "snapshot_conn", None)
+    if conn is not None and _local.snapshot_uri == uri:
+        return conn
+    new_conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    new_conn.execute("PRAGMA query_only=ON")
+    # nothing writes to a snapshot, so readers can skip the shared cache's
+    # table locks
+    new_conn.execute("PRAGMA read_uncommitted=ON")
+    with _connections_lock:
+        # close snapshot connections of finished threads and this
+        # thread's connection to the previous snapshot
+        finished = [thread for thread in _snapshot_connections
+                    if not thread.is_alive()]
+        for thread in finished:
+            _snapshot_connections.pop(thread).close()
+        old = _snapshot_connections.pop(threading.current_thread(), None)
+        _snapshot_connections[threading.current_thread()] = new_conn
+    if old is not None:
+        old.close()
+    _local.snapshot_conn, _local.snapshot_uri = new_conn, uri
+    return new_conn
+
+
+# checkpoint the WAL and release file handles when the process exits
+atexit.register(close_connections)
+
+
+@_invalidates_snapshot
 def create_table():
     """Creates the presidents table if it does not exist,
     with 'number' as the primary key."""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
+    cursor.execute(PRESIDENTS_TABLE_SQL)
+    create_events_tables(cursor)
+    create_portraits_table(cursor)
+    create_portrait_variants_table(cursor)
+    create_metadata_table(cursor)
+    conn.commit()
+    migrate(conn)
+
+
+def create_metadata_table(cursor):
+    """Create the key/value table for bookkeeping such as the last
+    refresh time."""
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS presidents (
-            number INTEGER PRIMARY KEY,
-            picture TEXT,
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+
+def _mark_written(cursor):
+    """Record when data that isn't refreshed with the presidents (the
+    portraits) was last written, so snapshots in other processes reload
+    it."""
+    create_metadata_table(cursor)
+    cursor.execute(
+        "INSERT INTO metadata (key, value) VALUES ('written_at', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (str(time.time()),))
+
+
+def _president_index_statements(create=True):
+    """The statements creating (or dropping) the presidents indexes."""
+    if not create:
+        return [f"DROP INDEX IF EXISTS {index}" for index in PRESIDENT_INDEXES]
+    return [f"CREATE INDEX IF NOT EXISTS {index} ON presidents ({column})"
+            for index, column in PRESIDENT_INDEXES.items()]
+
+
+def _create_president_indexes(conn):
+    """Migration 1: add the columns newer than the presidents table to
+    tables created without them, then index the columns the name and
+    party queries filter, group or sort on."""
+    existing = {row[1] for row in conn.execute(
+        "PRAGMA table_info(presidents)")}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(
+                f"ALTER TABLE presidents ADD COLUMN {column} {column_type}")
+    for statement in _president_index_statements():
+        conn.execute(statement)
+
+
+def _create_president_details(conn):
+    """Migration 2: child tables holding each president's vice presidents
+    and election years, parsed from the stored text so they can be
+    queried by year without scanning strings."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vice_presidents (
+            president_number INTEGER,
             name TEXT,
-            birth_death TEXT,
-            term TEXT,
-            party TEXT,
-            election TEXT,
-            vice_president TEXT
+            start_year INTEGER,
+            end_year INTEGER
         )
     ''')
-    conn.commit()
-    conn.close()
+    conn.execute("CREATE INDEX IF NOT EXISTS vice_presidents_president "
+                 "ON vice_presidents (president_number)")
+    conn.execute("CREATE INDEX IF NOT EXISTS vice_presidents_years "
+                 "ON vice_presidents (start_year, end_year)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS elections (
+            president_number INTEGER,
+            year INTEGER,
+            PRIMARY KEY (president_number, year)
+        )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS elections_year ON elections (year)")
+    _store_president_details(conn)
+
+
+# hint labels shown in the game and the columns they come from
+HINT_COLUMNS = {
+    "Birth/Death": "birth_death",
+    "term": "term",
+    "party": "party",
+    "Election Date": "election",
+    "Vice President": "vice_president"
+}
+# hint difficulties and the weight each hint gets when sampling, from its
+# quality (1 when the hint points to one president, lower when shared)
+DIFFICULTY_WEIGHTS = {
+    "easy": "quality",
+    "medium": "1.0",
+    "hard": "1.0 / quality",
+}
+DEFAULT_DIFFICULTY = "medium"
+# hint texts that say nothing about a president
+EMPTY_HINTS = ("", *utils.NO_VICE_PRESIDENT)
+# footnote markers left in scraped texts, e.g. the "[g]" in "1840[g]"
+HINT_FOOTNOTE_RE = re.compile(r"\[[^\]]*\]")
+
+
+def _create_hints(conn):
+    """Migration 3: the hints table, one row per usable hint about a
+    president with its quality and running totals of its weight within
+    its kind for each difficulty, so a weighted pick is an index seek."""
+    running_totals = "".join(f"{difficulty}_upto REAL,\n"
+                             for difficulty in DIFFICULTY_WEIGHTS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS hints (
+            president_number INTEGER,
+            kind TEXT,
+            text TEXT,
+            quality REAL,
+            {running_totals}
+            PRIMARY KEY (president_number, kind)
+        )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS hints_text ON hints (kind, text)")
+    for difficulty in DIFFICULTY_WEIGHTS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS hints_{difficulty} "
+                     f"ON hints (kind, {difficulty}_upto)")
+    _store_hints(conn)
+
+
+# schema migrations, in order: migration n is recorded in schema_version as
+# version n once it has been applied. Once a migration has been released
+# only ever append to this, databases that applied it never run it again.
+MIGRATIONS = (
+    _create_president_indexes,
+    _create_president_details,
+    _create_hints,
+)
+
+
+def get_schema_version(conn=None):
+    """Return the number of the last migration applied, 0 if none."""
+    conn = conn or get_connection()
+    try:
+        return conn.execute(
+            "SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0  # the table has not been created yet
+
+
+def migrate(conn=None):
+    """Apply the migrations the database doesn't have yet, each in its
+    own transaction together with its schema_version row. Returns the
+    schema version afterwards."""
+    conn = conn or get_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at REAL
+        )
+    ''')
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if version <= get_schema_version(conn):
+            continue  # fast path, already applied
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another connection may have migrated while we waited
+            if version > get_schema_version(conn):
+                migration(conn)
+                conn.execute("INSERT INTO schema_version (version, "
+                             "applied_at) VALUES (?, ?)",
+                             (version, time.time()))
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+    return get_schema_version(conn)
+
+
+def get_metadata(key, default=None):
+    """Fetch one value from the metadata table, or default if unset."""
+    try:
+        row = get_connection().execute(
+            "SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return default  # the table has not been created yet
+    return row[0] if row else default
+
+
+def get_metadata_values(keys):
+    """Fetch several values from the metadata table in one query, as a
+    dictionary holding only the keys that are set."""
+    try:
+        rows = get_connection().execute(
+            f"SELECT key, value FROM metadata WHERE key IN "
+            f"({', '.join('?' * len(keys))})", tuple(keys)).fetchall()
+    except sqlite3.OperationalError:
+        return {}  # the table has not been created yet
+    return dict(rows)
+
+
+@_invalidates_snapshot
+def set_metadata(values):
+    """Store a dictionary of key/value pairs in the metadata table."""
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO metadata (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(key, str(value)) for key, value in values.items()])
+
+
+def get_refreshed_at():
+    """Return when the presidents table was last refreshed (as a unix
+    timestamp), or None if it has never been populated."""
+    refreshed_at = get_metadata("refreshed_at")
+    return float(refreshed_at) if refreshed_at is not None else None
+
+
+# the columns shown in the table of presidents and their headings
+DISPLAY_COLUMNS = {"number": "Number", "name": "Name",
+                   "birth_death": "Birth & Death", "term": "Term",
+                   "party": "Party", "election": "Election",
+                   "vice_president": "Vice President"}
 
 
 def fetch_all_presidents():
-    """Fetch all records from the presidents table
-    as a list of dictionaries (except the picture links)."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+    """Fetch all records from the presidents table as a DataFrame for
+    display (without the picture links)."""
+    # the records are tuples, so pandas builds the columns straight from
+    # them without going through a dict per row
+    df = pd.DataFrame.from_records(fetch_president_records(),
+                                   columns=PRESIDENT_COLUMNS)
+    return df[list(DISPLAY_COLUMNS)].rename(columns=DISPLAY_COLUMNS)
 
-    # Select all columns but without the `id` column, as you've made `number`
-    #  the primary key
-    cursor.execute(
-        "SELECT number, picture, name, birth_death, term, party, election,"
-        " vice_president FROM presidents")
-    # fetch all rows as a list of tuples
-    records = cursor.fetchall()
-    conn.close()
-    # define column names for DataFrame
-    columns = ["Number", "Picture", "Name", "Birth & Death",
-               "Term", "Party", "Election", "Vice President"]
-    df = pd.DataFrame(records, columns=columns)  # create DataFrame
-    # drop picture column because it is not needed for display
-    return df.drop(columns=["Picture"])
+
+def fetch_president_records():
+    """Fetch every president as a President, ordered by number."""
+    conn = get_read_connection()
+    cursor = conn.execute(
+        f"SELECT {', '.join(PRESIDENT_COLUMNS)} FROM presidents "
+        "ORDER BY number")
+    return [President._make(row) for row in cursor.fetchall()]
 
 
 def fetch_president_names():
     """Fetch a president by their name."""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM presidents ORDER BY number")
     # convert the rows into a list of names
     names = [row[0] for row in cursor.fetchall()]
-    conn.close()
     return names
 
 
+def fetch_party_counts():
+    """Count the presidents of each party, as (party, count) pairs."""
+    return get_read_connection().execute(
+        "SELECT party, COUNT(*) FROM presidents GROUP BY party "
+        "ORDER BY party").fetchall()
+
+
+def fetch_vice_presidents_in_year(year):
+    """Fetch the names of the vice presidents in office at some point
+    during year, in order."""
+    return [row[0] for row in get_read_connection().execute(
+        "SELECT name FROM vice_presidents WHERE start_year <= ? "
+        "AND (end_year >= ? OR end_year IS NULL) "
+        "GROUP BY name ORDER BY MIN(start_year)", (year, year))]
+
+
+def fetch_era_names(year, span=12, exclude=None):
+    """Fetch the names of presidents elected within span years of year,
+    closest first, e.g. for wrong answers from the same era. exclude
+    is a name to leave out."""
+    return [row[0] for row in get_read_connection().execute(
+        "SELECT p.name FROM elections e "
+        "JOIN presidents p ON p.number = e.president_number "
+        "WHERE e.year BETWEEN ? AND ? AND p.name IS NOT ? "
+        "GROUP BY p.name ORDER BY MIN(ABS(e.year - ?)), MIN(p.number)",
+        (year - span, year + span, exclude, year))]
+
+
+def parse_term_columns(term):
+    """Parse a term into (term_start, term_end, is_incumbent), with the
+    dates as ISO strings and no end date for a term still going on."""
+    try:
+        start, end = utils.parse_term_dates(term)
+    except (AttributeError, ValueError, OverflowError):
+        return None, None, 0  # not a term we can read, e.g. "N/A"
+    if "Incumbent" in term:
+        return start.date().isoformat(), None, 1
+    return start.date().isoformat(), end.date().isoformat(), 0
+
+
+def president_row(president):
+    """Turn a scraped President into a row of STORED_COLUMNS values,
+    parsing the term dates once here instead of on every read."""
+    row = tuple(president._replace(**dict(zip(
+        TERM_COLUMNS, parse_term_columns(president.term)))))
+    return row + (content_hash(row),)
+
+
+def content_hash(row):
+    """Hash a row of PRESIDENT_COLUMNS values, to tell whether a stored
+    president changed without comparing every column."""
+    return hashlib.sha1(json.dumps(row[1:]).encode()).hexdigest()
+
+
+def _store_president_details(conn, numbers=None):
+    """Rewrite the vice_presidents and elections rows of the given
+    president numbers (of every president by default) from what the
+    presidents table holds now. Runs in the caller's transaction."""
+    columns = "number, vice_president, election, term_start, term_end"
+    if numbers is None:
+        conn.execute("DELETE FROM vice_presidents")
+        conn.execute("DELETE FROM elections")
+        rows = conn.execute(f"SELECT {columns} FROM presidents").fetchall()
+    else:
+        keys = [(number,) for number in numbers]
+        conn.executemany(
+            "DELETE FROM vice_presidents WHERE president_number = ?", keys)
+        conn.executemany(
+            "DELETE FROM elections WHERE president_number = ?", keys)
+        rows = [row for key in keys for row in conn.execute(
+            f"SELECT {columns} FROM presidents WHERE number = ?", key)]
+
+    vice_presidents, elections = [], []
+    for number, vice_president, election, term_start, term_end in rows:
+        start_year = int(term_start[:4]) if term_start else None
+        end_year = int(term_end[:4]) if term_end else None
+        vice_presidents.extend(
+            (number, *details) for details in utils.parse_vice_presidents(
+                vice_president, start_year, end_year))
+        elections.extend((number, year) for year in
+                         utils.parse_election_years(election))
+    conn.executemany("INSERT INTO vice_presidents (president_number, name, "
+                     "start_year, end_year) VALUES (?, ?, ?, ?)",
+                     vice_presidents)
+    conn.executemany("INSERT INTO elections (president_number, year) "
+                     "VALUES (?, ?)", elections)
+
+
+def _store_hints(conn, numbers=None):
+    """Rewrite the hints of the given president numbers (of every
+    president by default), leaving out empty hints and hints repeating
+    another one of the same president, then rescore every hint. Runs in
+    the caller's transaction."""
+    if numbers is not None and not numbers:
+        return  # nothing changed, the scores still hold
+    kinds = list(HINT_COLUMNS.values())
+    columns = f"number, {', '.join(kinds)}"
+    if numbers is None:
+        conn.execute("DELETE FROM hints")
+        rows = conn.execute(f"SELECT {columns} FROM presidents").fetchall()
+    else:
+        keys = [(number,) for number in numbers]
+        conn.executemany("DELETE FROM hints WHERE president_number = ?",
+                         keys)
+        rows = [row for key in keys for row in conn.execute(
+            f"SELECT {columns} FROM presidents WHERE number = ?", key)]
+
+    hints = []
+    for number, *texts in rows:
+        seen = set()
+        for kind, text in zip(kinds, texts):
+            text = HINT_FOOTNOTE_RE.sub("", text or "").strip()
+            # a text of only punctuation once the footnotes are gone
+            # (or none at all) is no hint
+            if not any(char.isalnum() for char in text):
+                continue
+            if text in EMPTY_HINTS or text in seen:
+                continue
+            seen.add(text)
+            hints.append((number, kind, text))
+    conn.executemany("INSERT INTO hints (president_number, kind, text) "
+                     "VALUES (?, ?, ?)", hints)
+    _score_hints(conn)
+
+
+def _score_hints(conn):
+    """Set the quality of every hint to 1 / the number of presidents
+    (counting a name once) it could be about, and the running totals of
+    the weights within each kind in president number order."""
+    conn.execute("""
+        UPDATE hints SET quality = 1.0 / shared.names
+        FROM (SELECT kind, text, COUNT(DISTINCT p.name) AS names
+              FROM hints JOIN presidents AS p
+                  ON p.number = hints.president_number
+              GROUP BY kind, text) AS shared
+        WHERE hints.kind = shared.kind AND hints.text = shared.text
+    """)
+    totals = ", ".join(
+        f"SUM({weight}) OVER by_kind AS {difficulty}_upto"
+        for difficulty, weight in DIFFICULTY_WEIGHTS.items())
+    conn.execute(f"""
+        UPDATE hints SET {", ".join(f"{difficulty}_upto = "
+                                    f"totals.{difficulty}_upto"
+                                    for difficulty in DIFFICULTY_WEIGHTS)}
+        FROM (SELECT president_number, kind, {totals} FROM hints
+              WINDOW by_kind AS (PARTITION BY kind
+                                 ORDER BY president_number)) AS totals
+        WHERE hints.president_number = totals.president_number
+            AND hints.kind = totals.kind
+    """)
+
+
+@_invalidates_snapshot
 def insert_president(president):
     """Insert a new president into the database"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
 
     # Check if the president already exists
     cursor.execute("SELECT 1 FROM presidents WHERE number = ?",
-                   (president.get("number"),))
+                   (president.number,))
     if cursor.fetchone():
-        conn.close()
         return  # Skip inserting if the president exists
 
-    cursor.execute('''
-        INSERT INTO presidents
-        (number, picture, name, birth_death, term, party, election,
-                   vice_president)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        president.get("number"),
-        president.get("picture"),
-        president.get("name"),
-        president.get("birth_death"),
-        president.get("term"),
-        president.get("party"),
-        president.get("election"),
-        president.get("vice_president")
-    )
-    )
+    cursor.execute(INSERT_PRESIDENT_SQL, president_row(president))
+    _store_president_details(conn, [cursor.lastrowid])
+    _store_hints(conn, [cursor.lastrowid])
     conn.commit()
-    conn.close()
 
 
-def fetch_random_president():
+@_invalidates_snapshot
+def bulk_upsert_presidents(presidents):
+    """Insert or update a batch of presidents in one transaction and
+    return counts of rows inserted, updated and skipped."""
+    conn = get_connection()
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    numbers = []
+
+    def rows():
+        # stream rows into executemany without building a list first
+        for president in presidents:
+            number = _president_number(president)
+            if number is None:
+                counts["skipped"] += 1  # can't upsert without a key
+                continue
+            numbers.append(number)
+            yield (number,) + president_row(president)[1:]
+
+    before = conn.execute("SELECT COUNT(*) FROM presidents").fetchone()[0]
+    changes = conn.total_changes
+    with conn:
+        # unchanged rows are not rewritten and are reported as skipped
+        conn.executemany(UPSERT_PRESIDENT_SQL, rows())
+        changed = conn.total_changes - changes
+        # a number given twice was upserted twice but has one set of
+        # child rows, from its last row
+        unique_numbers = list(dict.fromkeys(numbers))
+        _store_president_details(conn, unique_numbers)
+        _store_hints(conn, unique_numbers)
+    after = conn.execute("SELECT COUNT(*) FROM presidents").fetchone()[0]
+    processed = len(numbers)
+
+    counts["inserted"] = after - before
+    counts["updated"] = changed - counts["inserted"]
+    counts["skipped"] += processed - changed
+    return counts
+
+
+def _president_number(president):
+    """The president's number as the integer stored in the table, or None
+    if it doesn't have a usable one."""
+    try:
+        return int(president.number)
+    except (TypeError, ValueError):
+        return None
+
+
+@_invalidates_snapshot
+def sync_presidents(presidents, delete_missing=True):
+    """Make the presidents table match the scraped presidents: insert new
+    numbers, update rows whose content hash changed and delete numbers
+    that are gone, all in one transaction so readers only ever see the
+    old table or the new one. delete_missing can also be a function,
+    called once every president has been read, deciding whether to
+    delete. Returns counts of rows inserted, updated, deleted and skipped
+    (unchanged or without a number)."""
+    conn = get_connection()
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    stored = dict(conn.execute("SELECT number, content_hash FROM presidents"))
+    seen = set()
+    changed = []
+
+    def changed_rows():
+        # stream only the new and changed rows into executemany
+        for president in presidents:
+            number = _president_number(president)
+            if number is None or number in seen:
+                counts["skipped"] += 1  # no key, or already synced
+                continue
+            seen.add(number)
+            row = (number,) + president_row(president)[1:]
+            if number not in stored:
+                counts["inserted"] += 1
+            elif stored[number] != row[-1]:
+                counts["updated"] += 1
+            else:
+                counts["skipped"] += 1
+                continue
+            changed.append(number)
+            yield row
+
+    with conn:
+        conn.executemany(SET_PRESIDENT_SQL, changed_rows())
+        _store_president_details(conn, changed)
+        _store_hints(conn, changed)
+        if callable(delete_missing):
+            delete_missing = delete_missing()
+        if not seen or not delete_missing:
+            return counts  # nothing scraped, keep what is stored
+        gone = [number for number in stored if number not in seen]
+        conn.executemany("DELETE FROM presidents WHERE number = ?",
+                         [(number,) for number in gone])
+        _store_president_details(conn, gone)
+        _store_hints(conn, gone)
+        counts["deleted"] = len(gone)
+    return counts
+
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = ?", (table,)).fetchone() is not None
+
+
+def _execute_in_transaction(conn, statements):
+    """Run schema statements (or functions taking the connection) in one
+    transaction, so readers see the tables either as they were before
+    all of them or after all of them."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in statements:
+            if callable(statement):
+                statement(conn)
+            else:
+                conn.execute(statement)
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+@_invalidates_snapshot
+def rebuild_presidents(presidents, delete_missing=True):
+    """Load the scraped presidents into a new SHADOW_TABLE off to the side,
+    then swap it in for the presidents table with a rename inside one
+    transaction. The replaced table is kept as PREVIOUS_TABLE for
+    rollback_presidents. Returns the same counts as sync_presidents;
+    when nothing was scraped the presidents table is left alone."""
+    conn = get_connection()
+    columns = ", ".join(STORED_COLUMNS)
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    processed = 0
+
+    def rows():
+        # rows with a usable number, the first one wins for duplicates
+        nonlocal processed
+        for president in presidents:
+            number = _president_number(president)
+            if number is None:
+                counts["skipped"] += 1
+                continue
+            processed += 1
+            yield (number,) + president_row(president)[1:]
+
+    conn.execute(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+    conn.execute(PRESIDENTS_TABLE_SQL.replace("presidents", SHADOW_TABLE, 1))
+    with conn:
+        cursor = conn.executemany(
+            f"INSERT OR IGNORE INTO {SHADOW_TABLE} ({columns}) "
+            f"VALUES ({', '.join('?' * len(STORED_COLUMNS))})", rows())
+    counts["skipped"] += processed - max(cursor.rowcount, 0)
+    if callable(delete_missing):
+        delete_missing = delete_missing()
+    if not conn.execute(f"SELECT 1 FROM {SHADOW_TABLE}").fetchone():
+        conn.execute(f"DROP TABLE {SHADOW_TABLE}")
+        return counts  # nothing scraped, keep what is stored
+    if not delete_missing:
+        with conn:
+            # keep presidents the scrape didn't return
+            conn.execute(f"INSERT OR IGNORE INTO {SHADOW_TABLE} ({columns}) "
+                         f"SELECT {columns} FROM presidents")
+
+    # what changed, compared with the table about to be replaced
+    inserted, updated, unchanged, deleted = conn.execute(f"""
+        SELECT
+            SUM(old.number IS NULL),
+            SUM(old.number IS NOT NULL
+                AND old.content_hash IS NOT new.content_hash),
+            SUM(old.content_hash IS new.content_hash),
+            (SELECT COUNT(*) FROM presidents WHERE number NOT IN
+                (SELECT number FROM {SHADOW_TABLE}))
+        FROM {SHADOW_TABLE} AS new
+        LEFT JOIN presidents AS old ON old.number = new.number
+    """).fetchone()
+    counts.update(inserted=inserted, updated=updated, deleted=deleted)
+    counts["skipped"] += unchanged
+
+    # index names don't follow a renamed table, so the indexes move from
+    # the replaced table to the new one inside the swap
+    _execute_in_transaction(conn, [
+        f"DROP TABLE IF EXISTS {PREVIOUS_TABLE}",
+        *_president_index_statements(create=False),
+        f"ALTER TABLE presidents RENAME TO {PREVIOUS_TABLE}",
+        f"ALTER TABLE {SHADOW_TABLE} RENAME TO presidents",
+        *_president_index_statements(),
+        _store_president_details,
+        _store_hints])
+    return counts
+
+
+@_invalidates_snapshot
+def rollback_presidents():
+    """Swap the presidents table back with the one the last rebuild
+    replaced. Rolling back twice restores the rebuilt table. Returns
+    False if there is nothing to roll back to."""
+    conn = get_connection()
+    if not _table_exists(conn, PREVIOUS_TABLE):
+        return False
+    _execute_in_transaction(conn, [
+        f"DROP TABLE IF EXISTS {SHADOW_TABLE}",
+        *_president_index_statements(create=False),
+        f"ALTER TABLE presidents RENAME TO {SHADOW_TABLE}",
+        f"ALTER TABLE {PREVIOUS_TABLE} RENAME TO presidents",
+        f"ALTER TABLE {SHADOW_TABLE} RENAME TO {PREVIOUS_TABLE}",
+        *_president_index_statements(),
+        _store_president_details,
+        _store_hints])
+    return True
+
+
+def _number_range(cursor):
+    """Return the lowest and highest president numbers. Each is a single
+    lookup at one end of the primary key index."""
+    return cursor.execute(
+        "SELECT (SELECT MIN(number) FROM presidents),"
+        " (SELECT MAX(number) FROM presidents)").fetchone()
+
+
+def _random_row(cursor, columns, low, high, rng):
+    """Fetch the columns of a random president with one primary key
+    seek: the first president at or after a random number, so gaps in
+    the numbering are skipped."""
+    return cursor.execute(
+        f"SELECT {columns} FROM presidents WHERE number >= ? "
+        "ORDER BY number LIMIT 1", (rng.randint(low, high),)).fetchone()
+
+
+def _pick_hint_sql(difficulty):
+    """A query for one hint of a kind, drawn with its difficulty's weight:
+    the first hint whose running total passes a random fraction of the
+    kind's total, found with two seeks on the difficulty's index. Takes
+    the kind, the fraction and the kind again."""
+    upto = f"{difficulty}_upto"
+    return f"""
+        SELECT president_number, text FROM hints
+        WHERE kind = ? AND {upto} > ? * (
+            SELECT MAX({upto}) FROM hints WHERE kind = ?)
+        ORDER BY {upto} LIMIT 1
+    """
+
+
+def fetch_random_president(rng=None, difficulty=DEFAULT_DIFFICULTY):
     """Fetch one random president and return a hint about them"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    rng = rng or RNG
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    # Select all relevant columns for hint purposes
-    cursor.execute(
-        "SELECT name, picture, birth_death AS [Birth/Death], term, party,"
-        " election as [Election Date], vice_president as [Vice President] "
-        "FROM presidents")
-    # get all records from the query
-    presidents = cursor.fetchall()
-    conn.close()
+    low, high = _number_range(cursor)
+    if low is None:
+        return None  # no presidents stored
 
-    if presidents:
-        # Randomly pick a president
-        president = random.choice(presidents)
-
-        # Randomly choose a hint column
-        hint_columns = ['Birth/Death', 'term', 'party',
-                        'Election Date', 'Vice President']
-        hint_column = random.choice(hint_columns)
-
-        # Create a dictionary to return both name, picture, and hint
-        president_info = {
-            'name': president[0],
-            'picture': president[1],
-            # Offset by 2 because of name and pic
-            'hint': president[hint_columns.index(hint_column) + 2],
-            'hint_column': hint_column  # which column the hint is from
-        }
-
-        return president_info
-    else:
-        return None
+    # Randomly choose a hint column, then a president with such a hint
+    hint_column = rng.choice(list(HINT_COLUMNS))
+    kind = HINT_COLUMNS[hint_column]
+    # if no president has this kind of hint, fall back to a random
+    # president without one (the second query only runs then)
+    president = cursor.execute(f"""
+        SELECT * FROM (
+            SELECT p.name, p.picture, hint.text
+            FROM ({_pick_hint_sql(difficulty)}) AS hint
+            JOIN presidents p ON p.number = hint.president_number)
+        UNION ALL
+        SELECT * FROM (
+            SELECT name, picture, NULL FROM presidents WHERE number >= ?
+            ORDER BY number LIMIT 1)
+        LIMIT 1
+    """, (kind, rng.random(), kind, rng.randint(low, high))).fetchone()
+
+    # Create a dictionary to return both name, picture, and hint
+    president_info = {
+        'name': president[0],
+        'picture': president[1],
+        'hint': president[2],
+        'hint_column': hint_column  # which column the hint is from
+    }
 
-def fetch_wrong_presidents(correct_name, count=3):
+    return president_info
+
+
+def fetch_wrong_presidents(correct_name, count=3, rng=None):
     """Fetches a list of 3 wrong president names (not
     including the correct one)."""
-    conn = sqlite3.connect(DATABASE_NAME)
+    rng = rng or RNG
+    conn = get_read_connection()
     cursor = conn.cursor()
-    # select random names from the database, excluding the correct name
+
+    low, high = _number_range(cursor)
+    if low is None:
+        return []
+    wrong_names = []
+    # with plenty of presidents, random primary key seeks find distinct
+    # wrong names quickly no matter how big the table is
+    if high - low + 1 >= 4 * (count + 1):
+        for _ in range(count * 10):
+            if len(wrong_names) == count:
+                return wrong_names
+            name = _random_row(cursor, "name", low, high, rng)[0]
+            if name != correct_name and name not in wrong_names:
+                wrong_names.append(name)
+
+    # small tables (or very unlucky draws) sample from every other name
+    return wrong_names + _sample_other_names(
+        cursor, correct_name, wrong_names, count - len(wrong_names), rng)
+
+
+def _sample_other_names(cursor, correct_name, taken, count, rng):
+    """Randomly pick up to count names that are neither the correct one
+    nor already taken, by reading every name (only for small tables)."""
     cursor.execute(
-        "SELECT name FROM presidents WHERE name != ? ORDER BY "
-        "RANDOM() LIMIT ?", (correct_name, count))
-    # return only the names as a list
-    wrong_names = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return wrong_names
+        "SELECT name FROM presidents WHERE name != ? GROUP BY name "
+        "ORDER BY MIN(number)", (correct_name,))
+    other_names = [row[0] for row in cursor.fetchall()
+                   if row[0] not in taken]
+    return rng.sample(other_names, min(count, len(other_names)))
+
 
+def fetch_question(num_choices=4, hint_columns=None, rng=None,
+                   difficulty=DEFAULT_DIFFICULTY):
+    """Fetch everything for one question in a single query: a president
+    drawn through a hint from one of hint_columns (labels of HINT_COLUMNS,
+    all of them by default), weighted by difficulty (a key of
+    DIFFICULTY_WEIGHTS), and num_choices - 1 wrong names. Returns None if
+    there are no presidents stored."""
+    rng = rng or RNG
+    hint_column = rng.choice(list(hint_columns or HINT_COLUMNS))
+    kind = HINT_COLUMNS[hint_column]
+    hint_fraction = rng.random()
+    count = num_choices - 1
+    # draw extra wrong answers, since some may repeat a name
+    fractions = [rng.random() for _ in range(1 + 3 * count)]
 
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    parameters = [value for pick in enumerate(fractions, start=1)
+                  for value in pick]
+    parameters.extend([kind, hint_fraction, kind])
+    # the answer comes from a weighted pick of a hint, and each random
+    # fraction becomes a primary key seek between the lowest and highest
+    # numbers for the wrong answers
+    cursor.execute(f'''
+        WITH bounds(low, high) AS (
+            SELECT (SELECT MIN(number) FROM presidents),
+                   (SELECT MAX(number) FROM presidents)
+        ),
+        picks(position, target) AS (
+            SELECT picked.column1,
+                   low + CAST(picked.column2 * (high - low + 1) AS INTEGER)
+            FROM (VALUES {", ".join(["(?, ?)"] * len(fractions))}) AS picked,
+                 bounds
+        ),
+        hint AS ({_pick_hint_sql(difficulty)})
+        SELECT 0, p.number, p.name, p.picture, hint.text
+        FROM hint JOIN presidents p ON p.number = hint.president_number
+        UNION ALL
+        SELECT picks.position, p.number, p.name, p.picture, NULL
+        FROM picks JOIN presidents p ON p.number = (
+            SELECT number FROM presidents WHERE number >= picks.target
+            ORDER BY number LIMIT 1)
+        ORDER BY 1
+    ''', parameters)
+    rows = cursor.fetchall()
+    if not rows:
+        return None  # no presidents stored
+
+    # without a hint of this kind the first pick is the answer, hintless
+    number, name, picture, hint = rows[0][1:]
+    wrong_names = []
+    for row in rows[1:]:
+        if row[2] != name and row[2] not in wrong_names:
+            wrong_names.append(row[2])
+    wrong_names = wrong_names[:count]
+    if len(wrong_names) < count:
+        # too few presidents for random draws, top up from every name
+        wrong_names += _sample_other_names(
+            cursor, name, wrong_names, count - len(wrong_names), rng)
+    return {
+        "number": number,
+        "name": name,
+        "picture": picture,
+        "hint": hint,
+        "hint_column": hint_column,
+        "wrong_names": wrong_names
+    }
+
+
+@_invalidates_snapshot
 def reset_database():
     """Reset the database by deleting all records from the tables."""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
 
     # Create the presidents table if it doesn't exist
+    cursor.execute(PRESIDENTS_TABLE_SQL)
+    # Delete all rows from the presidents table
+    cursor.execute("DELETE FROM presidents")
+    if _table_exists(conn, "vice_presidents"):
+        _store_president_details(conn)  # and their child rows
+    if _table_exists(conn, "hints"):
+        _store_hints(conn)
+    conn.commit()
+
+
+def create_events_tables(cursor):
+    """Create the tables that cache historical events by year: one row
+    per event, plus one row per fetched year recording if it worked."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            year INTEGER,
+            content TEXT,
+            fetched_at REAL
+        )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS events_year ON events (year)")
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS presidents (
+        CREATE TABLE IF NOT EXISTS event_years (
+            year INTEGER PRIMARY KEY,
+            ok INTEGER,
+            fetched_at REAL
+        )
+    ''')
+
+
+def fetch_cached_events(start_year, end_year, failure_ttl):
+    """Fetch cached events for the years from start_year up to (but not
+    including) end_year in one query. Returns {year: [content, ...]},
+    with None for years that failed less than failure_ttl seconds ago.
+    Years that were never fetched are left out."""
+    try:
+        rows = get_connection().execute('''
+            SELECT y.year, y.ok, e.content
+            FROM event_years y LEFT JOIN events e ON e.year = y.year
+            WHERE y.year >= ? AND y.year < ?
+                AND (y.ok = 1 OR y.fetched_at > ?)
+            ORDER BY y.year, e.rowid
+        ''', (start_year, end_year, time.time() - failure_ttl)).fetchall()
+    except sqlite3.OperationalError:
+        return {}  # the events tables have not been created yet
+
+    events_by_year = {}
+    for year, ok, content in rows:
+        events = events_by_year.setdefault(year, [] if ok else None)
+        if content is not None:
+            events.append(content)
+    return events_by_year
+
+
+def store_events(events_by_year):
+    """Cache fetched events in one transaction. events_by_year maps each
+    year to a list of event contents, or None if fetching it failed."""
+    conn = get_connection()
+    fetched_at = time.time()
+    with conn:
+        cursor = conn.cursor()
+        create_events_tables(cursor)
+        for year, events in events_by_year.items():
+            # replace anything cached for the year before
+            cursor.execute("DELETE FROM events WHERE year = ?", (year,))
+            cursor.executemany(
+                "INSERT INTO events (year, content, fetched_at) "
+                "VALUES (?, ?, ?)",
+                [(year, content, fetched_at) for content in events or []])
+            cursor.execute(
+                "INSERT OR REPLACE INTO event_years (year, ok, fetched_at) "
+                "VALUES (?, ?, ?)", (year, events is not None, fetched_at))
+
+
+def create_portraits_table(cursor):
+    """Create the table of downloaded portraits, one per president
+    number, with the url it came from and a hash of the image."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portraits (
             number INTEGER PRIMARY KEY,
-            picture TEXT,
-            name TEXT,
-            birth_death TEXT,
-            term TEXT,
-            party TEXT,
-            election TEXT,
-            vice_president TEXT
+            url TEXT,
+            content_hash TEXT,
+            content_type TEXT,
+            data BLOB,
+            fetched_at REAL
         )
     ''')
-    # Delete all rows from the presidents table
-    cursor.execute("DELETE FROM presidents")
-    conn.commit()
-    conn.close()
+
+
+def fetch_missing_portraits():
+    """Fetch (number, picture url) for every president whose portrait has
+    not been downloaded yet, or was downloaded from a different url."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    create_portraits_table(cursor)
+    cursor.execute('''
+        SELECT p.number, p.picture FROM presidents p
+        LEFT JOIN portraits i ON i.number = p.number
+        WHERE p.picture IS NOT NULL AND i.url IS NOT p.picture
+        ORDER BY p.number
+    ''')
+    return cursor.fetchall()
+
+
+@_invalidates_snapshot
+def store_portraits(portraits):
+    """Store downloaded portraits in one transaction. Each one is a
+    dictionary with number, url, content_hash, content_type and data."""
+    conn = get_connection()
+    fetched_at = time.time()
+    with conn:
+        cursor = conn.cursor()
+        create_portraits_table(cursor)
+        create_portrait_variants_table(cursor)
+        # resized copies of a replaced portrait are out of date
+        cursor.executemany(
+            "DELETE FROM portrait_variants WHERE number = ?",
+            [(portrait["number"],) for portrait in portraits])
+        cursor.executemany(
+            "INSERT OR REPLACE INTO portraits (number, url, content_hash, "
+            "content_type, data, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(portrait["number"], portrait["url"], portrait["content_hash"],
+              portrait["content_type"], portrait["data"], fetched_at)
+             for portrait in portraits])
+        _mark_written(cursor)
+
+
+def fetch_portrait(number):
+    """Fetch the stored portrait of a president as bytes, or None if it
+    hasn't been downloaded."""
+    try:
+        row = get_read_connection().execute(
+            "SELECT data FROM portraits WHERE number = ?",
+            (number,)).fetchone()
+    except sqlite3.OperationalError:
+        return None  # the table has not been created yet
+    return row[0] if row else None
+
+
+def create_portrait_variants_table(cursor):
+    """Create the table of resized, compressed copies of each portrait,
+    one per president number, width and image format."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portrait_variants (
+            number INTEGER,
+            width INTEGER,
+            format TEXT,
+            content_type TEXT,
+            data BLOB,
+            PRIMARY KEY (number, width, format)
+        )
+    ''')
+
+
+def fetch_portraits_without_variants():
+    """Fetch (number, data) for every stored portrait that has no
+    resized copies yet."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    create_portraits_table(cursor)
+    create_portrait_variants_table(cursor)
+    cursor.execute('''
+        SELECT number, data FROM portraits p WHERE NOT EXISTS (
+            SELECT 1 FROM portrait_variants v WHERE v.number = p.number)
+        ORDER BY number
+    ''')
+    return cursor.fetchall()
+
+
+@_invalidates_snapshot
+def store_portrait_variants(variants):
+    """Store resized portraits in one transaction. Each one is a
+    dictionary with number, width, format, content_type and data."""
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        create_portrait_variants_table(cursor)
+        cursor.executemany(
+            "INSERT OR REPLACE INTO portrait_variants (number, width, format,"
+            " content_type, data) VALUES (?, ?, ?, ?, ?)",
+            [(variant["number"], variant["width"], variant["format"],
+              variant["content_type"], variant["data"])
+             for variant in variants])
+        _mark_written(cursor)
+
+
+def fetch_portrait_variant(number, width):
+    """Fetch the smallest stored copy of a portrait that is at least
+    width pixels wide (or the widest one if none are), as bytes. Returns
+    None if the portrait has no resized copies."""
+    try:
+        row = get_read_connection().execute('''
+            SELECT data FROM portrait_variants WHERE number = ?
+            ORDER BY width >= ? DESC,
+                CASE WHEN width >= ? THEN width ELSE -width END,
+                length(data)
+            LIMIT 1
+        ''', (number, width, width)).fetchone()
+    except sqlite3.OperationalError:
+        return None  # the table has not been created yet
+    return row[0] if row else None
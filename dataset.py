@@ -0,0 +1,74 @@
+import functools
+import sqlite3
+import pandas as pd
+import streamlit as st
+from streamlit import runtime
+import database
+
+
+class Dataset:
+    """Every president record, loaded once, with lookups by name and
+    number."""
+
+    def __init__(self, records):
+        self.records = records
+        self.by_number = {record.number: record for record in records}
+        # a name can map to several records (e.g. non-consecutive terms)
+        self.by_name = {}
+        for record in records:
+            self.by_name.setdefault(record.name, []).append(record)
+
+
+def _memoize(func):
+    """Memoize with st.cache_data when running under Streamlit, and with
+    a plain lru_cache otherwise (tests, scripts)."""
+    if runtime.exists():
+        return st.cache_data(max_entries=1, show_spinner=False)(func)
+    cached = functools.lru_cache(maxsize=1)(func)
+    cached.clear = cached.cache_clear
+    return cached
+
+
+@_memoize
+def _load_dataset(database_name, refreshed_at):
+    # the arguments are only the cache key: a new database file or a new
+    # refresh timestamp means the cached records are out of date
+    try:
+        records = database.fetch_president_records()
+    except sqlite3.OperationalError:
+        records = []  # the table has not been created yet
+    return Dataset(records)
+
+
+def get_dataset():
+    """Return the president dataset, reloading it only after the
+    database has been refreshed."""
+    return _load_dataset(database.DATABASE_NAME, database.get_refreshed_at())
+
+
+def clear_cache():
+    """Forget the loaded dataset so the next call reloads it."""
+    _load_dataset.clear()
+
+
+def get_presidents():
+    """Return every president record, ordered by number."""
+    return get_dataset().records
+
+
+def find_by_name(name):
+    """Return the list of records for a president's name (one per
+    term), or an empty list if there is no such president."""
+    return get_dataset().by_name.get(name, [])
+
+
+def find_by_number(number):
+    """Return the record for a president number, or None."""
+    return get_dataset().by_number.get(int(number))
+
+
+def presidents_dataframe():
+    """Build a new DataFrame of every president, safe for the caller to
+    modify."""
+    return pd.DataFrame.from_records(get_presidents(),
+                                     columns=database.PRESIDENT_COLUMNS)
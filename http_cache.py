@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import time
+import requests
+
+CACHE_DIR = os.path.join(".cache", "http")  # where cached responses live
+# how long (in seconds) a cached response is served without asking the
+# server again, one day by default
+CACHE_TTL = float(os.environ.get("HTTP_CACHE_TTL", 24 * 3600))
+REQUEST_TIMEOUT = 10  # seconds to wait for each request
+
+
+class CachedResponse:
+    """The parts of a requests.Response the scraper uses, rebuilt from
+    a cache entry."""
+
+    def __init__(self, status_code, text, headers=None, from_cache=False):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+
+class FileCache:
+    """Response cache that keeps one JSON file per URL in a directory.
+
+    Any object with the same get(url) and set(url, entry) methods can be
+    used in its place."""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, url):
+        # hash the url so it is always a safe file name
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, url):
+        """Return the cached entry for url, or None if there isn't one."""
+        try:
+            with open(self._path(url), encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return None  # missing or unreadable entries are cache misses
+
+    def set(self, url, entry):
+        """Store an entry for url, replacing any older one."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(url)
+        # write to a temporary file first so readers never see half an entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(tmp_path, path)
+
+
+def cached_get(url, cache=None, ttl=None):
+    """GET a url through a response cache.
+
+    Within the ttl the body is served straight from the cache. After
+    that the request is revalidated with If-None-Match/If-Modified-Since
+    and a 304 reply reuses the cached body. Without a cache this is a
+    plain requests.get. Requests give up after REQUEST_TIMEOUT
+    seconds."""
+    if cache is None:
+        return requests.get(url, timeout=REQUEST_TIMEOUT)
+    ttl = CACHE_TTL if ttl is None else ttl
+
+    entry = cache.get(url)
+    if entry and time.time() - entry["fetched_at"] < ttl:
+        return CachedResponse(200, entry["body"], from_cache=True)
+
+    # ask the server whether our copy is still current
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        response = requests.get(url, headers=headers,
+                                timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException:
+        if entry:
+            return CachedResponse(200, entry["body"], from_cache=True)
+        raise  # nothing cached to fall back on
+
+    if response.status_code == 304 and entry:
+        # not modified, so keep the body and restart the ttl
+        entry["fetched_at"] = time.time()
+        cache.set(url, entry)
+        return CachedResponse(200, entry["body"], from_cache=True)
+    if response.status_code == 200:
+        cache.set(url, {
+            "body": response.text,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time()
+        })
+    return response
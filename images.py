@@ -0,0 +1,131 @@
+import hashlib
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from PIL import Image, UnidentifiedImageError
+import database
+
+MAX_WORKERS = 8  # most portraits downloaded at the same time
+REQUEST_TIMEOUT = 10  # seconds to wait for each download
+DISPLAY_WIDTH = 300  # width of the portrait in the game
+# widths and formats of the resized copies made of every portrait
+VARIANT_WIDTHS = (150, 300)
+VARIANT_FORMATS = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+VARIANT_QUALITY = 80
+# the width part of a Wikimedia thumbnail url, e.g. ".../80px-Name.jpg"
+THUMBNAIL_WIDTH_RE = re.compile(r"/\d+px-")
+# Wikimedia refuses requests that don't say who is asking
+USER_AGENT = ("GuessThePresident/1.0 "
+              "(https://github.com/ada-may/GuessThePresident)")
+
+
+def source_url(url, width=max(VARIANT_WIDTHS)):
+    """The url of a Wikimedia thumbnail width pixels wide, so the widest
+    variant isn't made from the small thumbnail on the presidents page.
+    Other urls are returned unchanged."""
+    return THUMBNAIL_WIDTH_RE.sub(f"/{width}px-", url, count=1)
+
+
+def download_portrait(number, url):
+    """Download one portrait, at the width of the widest variant when
+    the url is a thumbnail, else as it is. Returns a dictionary ready for
+    database.store_portraits, or None if the download failed."""
+    # Wikimedia refuses thumbnails wider than the original, so fall back
+    # to the url as scraped
+    for download_url in dict.fromkeys([source_url(url), url]):
+        try:
+            response = requests.get(download_url, timeout=REQUEST_TIMEOUT,
+                                    headers={"User-Agent": USER_AGENT})
+            response.raise_for_status()
+            break
+        except requests.exceptions.RequestException as e:
+            error = e
+    else:
+        print(f"Error downloading portrait {number}: {error}")
+        return None
+    return {
+        "number": number,
+        "url": url,
+        "content_hash": hashlib.sha256(response.content).hexdigest(),
+        "content_type": response.headers.get("Content-Type", "image/jpeg"),
+        "data": response.content
+    }
+
+
+def prefetch_portraits(max_workers=None):
+    """Download every portrait that isn't stored yet (or whose url
+    changed) using a bounded thread pool, and store them in one
+    transaction. Returns the number of portraits downloaded and the
+    number that failed."""
+    max_workers = MAX_WORKERS if max_workers is None else max_workers
+    missing = database.fetch_missing_portraits()
+    if not missing:
+        return {"downloaded": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(
+            1, min(max_workers, len(missing)))) as executor:
+        results = list(executor.map(lambda row: download_portrait(*row),
+                                    missing))
+    portraits = [portrait for portrait in results if portrait]
+    database.store_portraits(portraits)
+    build_missing_variants()
+    return {"downloaded": len(portraits),
+            "failed": len(results) - len(portraits)}
+
+
+def make_variants(number, data):
+    """Resize a portrait to each of VARIANT_WIDTHS (never enlarging it)
+    and compress it in each of VARIANT_FORMATS. Each copy is stored under
+    the width it really has, and widths the portrait is too small for
+    are made only once, at its own width. Returns a list of dictionaries
+    ready for database.store_portrait_variants, empty if the image can't
+    be read."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        return []
+    variants = []
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    for width in widths:
+        resized = image
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        for image_format, content_type in VARIANT_FORMATS.items():
+            # JPEG has no transparency, so flatten to plain RGB first
+            mode = "RGB" if image_format == "JPEG" else "RGBA"
+            output = io.BytesIO()
+            resized.convert(mode).save(output, image_format,
+                                       quality=VARIANT_QUALITY)
+            variants.append({
+                "number": number,
+                "width": resized.width,
+                "format": image_format,
+                "content_type": content_type,
+                "data": output.getvalue()
+            })
+    return variants
+
+
+def build_missing_variants():
+    """Make the resized copies of every stored portrait that doesn't have
+    them yet. Returns how many portraits were resized."""
+    portraits = database.fetch_portraits_without_variants()
+    variants = [variant for number, data in portraits
+                for variant in make_variants(number, data)]
+    database.store_portrait_variants(variants)
+    return len(portraits)
+
+
+def portrait_source(number, url, width=DISPLAY_WIDTH):
+    """What to give st.image for a president: the smallest stored copy at
+    least width pixels wide, else the downloaded portrait, else the
+    original url."""
+    if number is not None:
+        data = database.fetch_portrait_variant(number, width)
+        if data is None:
+            data = database.fetch_portrait(number)
+        if data:
+            return data
+    return url
@@ -0,0 +1,20 @@
+from typing import NamedTuple, Optional
+
+
+class President(NamedTuple):
+    """One president's term, as scraped and as stored. A tuple, so each
+    record costs no more than its values, and a list of them becomes a
+    DataFrame with pandas.DataFrame.from_records(records,
+    columns=President._fields)."""
+    number: int
+    picture: str
+    name: str
+    birth_death: str
+    term: str
+    party: str
+    election: str
+    vice_president: str
+    # parsed from the term when stored (see database.parse_term_columns)
+    term_start: Optional[str] = None
+    term_end: Optional[str] = None
+    is_incumbent: int = 0
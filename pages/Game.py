@@ -1,6 +1,6 @@
 import streamlit as st
-import random
-import database
+import images
+import questions
 import utils
 
 
@@ -14,25 +14,21 @@ def initialize_session_state():
 
 
 def load_new_question():
-    # load a new random president and generate choices
-    result = database.fetch_random_president()
-    if result:
-        correct_name, picture_url, hint, hint_column = result[
-            "name"], result["picture"], result["hint"], result["hint_column"]
-        wrong_names = database.fetch_wrong_presidents(correct_name)
-        options = wrong_names + [correct_name]
-        random.shuffle(options)
+    # take a ready-made question (president, hint and choices) from the pool
+    question = questions.get_question()
+    if question:
         # store all question-related info in session state
         st.session_state.answer = {
-            "name": correct_name,
-            "picture": picture_url,
-            "choices": options,
+            "number": question["number"],
+            "name": question["name"],
+            "picture": question["picture"],
+            "choices": question["choices"],
             "guessed": False,
             "feedback": None,
-            "hint": hint,
-            "hint_column": hint_column
+            "hint": question["hint"],
+            "hint_column": question["hint_column"]
         }
-        st.session_state.hint = hint
+        st.session_state.hint = question["hint"]
         st.session_state.show_ai_hint = False
 
 
@@ -84,8 +80,9 @@ def render_game_ui():
 
     answer_data = st.session_state.answer
 
-    # show president image
-    st.image(st.session_state.answer["picture"], width=300)
+    # show president image, from the local copy when there is one
+    st.image(images.portrait_source(answer_data.get("number"),
+                                    answer_data["picture"]), width=300)
 
     # hint button
     if st.button("Get a Hint"):
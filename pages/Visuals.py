@@ -2,7 +2,9 @@ import utils
 import altair as alt
 import pandas as pd
 import streamlit as st
-from scraper import scrape_presidents
+import database
+import dataset
+import refresh
 
 @alt.theme.register('custom_streamlit_theme', enable=True)
 def custom_streamlit_theme():
@@ -50,9 +52,10 @@ def plot_years_served_chart(binned_counts):
     ).properties(height=400)
 
 
-def get_party_counts(df):
-    # count presidents by political party
-    return df.groupby("party").size().reset_index(name="count")
+def get_party_counts():
+    # count presidents by political party, grouped on the party index
+    return pd.DataFrame(database.fetch_party_counts(),
+                        columns=["party", "count"])
 
 
 def plot_party_pie_chart(party_counts):
@@ -66,11 +69,8 @@ def plot_party_pie_chart(party_counts):
 
 
 def parse_term_dates(df):
-    # parse term string into separate start and end dates
-    df[["Start", "End"]] = df["term"].apply(
-        lambda t: pd.Series(utils.parse_term_dates(t)))
-    df["Start"] = pd.to_datetime(df["Start"])
-    df["End"] = pd.to_datetime(df["End"])
+    # parse term strings into separate start and end dates, all at once
+    df["Start"], df["End"] = utils.term_dates(df)
     return df
 
 
@@ -84,16 +84,20 @@ def plot_timeline(df):
     ).properties(height=200)
 
 
-# scrape data and show charts in Streamlit app
-df = pd.DataFrame(scrape_presidents())
+if __name__ == "__main__":
+    # load the stored presidents and show charts in Streamlit app
+    refresh.ensure_fresh()
+    df = dataset.presidents_dataframe()
 
-st.subheader("Presidents by Years Served")
-st.altair_chart(plot_years_served_chart(
-    get_binned_counts(prepare_duration_data(df))), use_container_width=True)
+    st.subheader("Presidents by Years Served")
+    st.altair_chart(plot_years_served_chart(
+        get_binned_counts(prepare_duration_data(df))),
+        use_container_width=True)
 
-st.subheader("Presidents by Political Party")
-st.altair_chart(plot_party_pie_chart(
-    get_party_counts(df)), use_container_width=True)
+    st.subheader("Presidents by Political Party")
+    st.altair_chart(plot_party_pie_chart(
+        get_party_counts()), use_container_width=True)
 
-st.subheader("Presidents Timeline")
-st.altair_chart(plot_timeline(parse_term_dates(df)), use_container_width=True)
+    st.subheader("Presidents Timeline")
+    st.altair_chart(plot_timeline(parse_term_dates(df)),
+                    use_container_width=True)
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+import database
+
+POOL_SIZE = 32  # questions kept ready
+LOW_WATERMARK = 8  # refill in the background below this many
+STAMP_CHECK_INTERVAL = 2.0  # seconds between checks of the refresh stamp
+NUM_CHOICES = 4  # answer choices per question, including the right one
+
+
+def build_question():
+    """Build one question: a random president, their hint and shuffled
+    answer choices. Returns None if there are no presidents stored."""
+    # the answer, hint and wrong names all come from one query
+    result = database.fetch_question(NUM_CHOICES)
+    if not result:
+        return None
+    options = result["wrong_names"] + [result["name"]]
+    # the database's generator, so a seeded one reproduces the question
+    database.RNG.shuffle(options)
+    return {
+        "number": result["number"],
+        "name": result["name"],
+        "picture": result["picture"],
+        "choices": options,
+        "hint": result["hint"],
+        "hint_column": result["hint_column"]
+    }
+
+
+class QuestionPool:
+    """A ring buffer of ready-made questions shared by every session.
+
+    Taking a question is a deque pop, and when fewer than low_watermark
+    are left a background thread builds more. Each question is tagged
+    with the refresh stamp (database.get_refreshed_at by default) it was
+    built under, and questions from before the latest refresh, by this
+    process or another one, are thrown away instead of being served.
+    The stamp is read at most every STAMP_CHECK_INTERVAL seconds, a
+    refresh in this process clears the pool straight away."""
+
+    def __init__(self, size=POOL_SIZE, low_watermark=LOW_WATERMARK,
+                 build=build_question, stamp=None):
+        self.size = size
+        self.low_watermark = low_watermark
+        self.build = build
+        self.stamp = stamp
+        self._questions = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._refill_thread = None
+        self._checked_stamp = None  # (when it was read, stamp)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def _current_stamp(self):
+        checked = self._checked_stamp
+        if checked is not None and \
+                time.monotonic() - checked[0] < STAMP_CHECK_INTERVAL:
+            return checked[1]  # fast path, recently checked
+        checked_at = time.monotonic()
+        if self.stamp is None:
+            stamp = database.get_refreshed_at()
+        else:
+            stamp = self.stamp()
+        self._checked_stamp = (checked_at, stamp)
+        return stamp
+
+    def get(self):
+        """Take the next question, building one on the spot only if the
+        pool has run dry (or only holds questions built from old
+        data)."""
+        stamp = self._current_stamp()
+        question = None
+        while question is None:
+            try:
+                built_at, question = self._questions.popleft()
+            except IndexError:
+                question = self.build()
+                break
+            if built_at != stamp:
+                question = None  # built before the latest refresh
+        if len(self._questions) < self.low_watermark:
+            self.refill_in_background()
+        return question
+
+    def fill(self):
+        """Build questions until the pool is full (or there is nothing
+        to build questions from)."""
+        while len(self._questions) < self.size:
+            # read the stamp first, so a question built while a refresh
+            # is being written counts as built from the old data
+            stamp = self._current_stamp()
+            question = self.build()
+            if question is None:
+                return
+            self._questions.append((stamp, question))
+
+    def refill_in_background(self):
+        """Start filling the pool on a background thread, unless one is
+        already running. Returns that thread."""
+        with self._lock:
+            if self._refill_thread is None or \
+                    not self._refill_thread.is_alive():
+                self._refill_thread = threading.Thread(target=self.fill,
+                                                       daemon=True)
+                self._refill_thread.start()
+            return self._refill_thread
+
+    def clear(self):
+        """Drop every prepared question, e.g. after the data changed."""
+        self._checked_stamp = None  # read the new stamp on the next get
+        self._questions.clear()
+
+
+# the pool shared by every Streamlit session in this process
+POOL = QuestionPool()
+
+
+def get_question():
+    """Take a ready-made question from the shared pool."""
+    return POOL.get()
@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import api
+import database
+import images
+import questions
+from scraper import is_error, iter_presidents
+
+# how long (in seconds) scraped data stays fresh, one week by default
+REFRESH_TTL = float(os.environ.get("PRESIDENTS_REFRESH_TTL", 7 * 24 * 3600))
+# how long (in seconds) to wait after a failed refresh before scraping
+# again, 15 minutes by default (never longer than the ttl)
+RETRY_INTERVAL = float(os.environ.get("PRESIDENTS_RETRY_INTERVAL", 15 * 60))
+
+# bump this when ingestion stores something new, so databases filled by
+# an older version are refreshed even if they are not stale yet
+INGEST_VERSION = 2
+
+# only one refresh at a time, even with many Streamlit sessions
+_refresh_lock = threading.Lock()
+
+
+def is_stale(ttl=None):
+    """Check whether the database needs refreshing. This is a single
+    indexed query on the metadata table. Stale data is not stale again
+    until RETRY_INTERVAL after a refresh that failed, so the old rows
+    keep being served instead of every page load scraping again."""
+    ttl = REFRESH_TTL if ttl is None else ttl
+    now = time.time()
+    values = database.get_metadata_values(("refreshed_at", "ingest_version",
+                                           "refresh_failed_at"))
+    failed_at = values.get("refresh_failed_at")
+    if failed_at and now - float(failed_at) < min(ttl, RETRY_INTERVAL):
+        return False
+    if values.get("ingest_version") != str(INGEST_VERSION):
+        return True
+    return now - float(values["refreshed_at"]) > ttl
+
+
+def hash_records(records, digest):
+    """Yield each record while feeding it into a running hash."""
+    for record in records:
+        digest.update(json.dumps(record, sort_keys=True).encode())
+        yield record
+
+
+def skip_errors(records, errors):
+    """Yield the presidents and collect the scraper's error records."""
+    for record in records:
+        if is_error(record):
+            errors.append(record)
+        else:
+            yield record
+
+
+def refresh_database(rebuild=False, ttl=None):
+    """Scrape the presidents and load them into the database, recording
+    when it happened and a hash of the scraped content. Rows are written
+    as they are parsed, either by syncing only the changed rows or, with
+    rebuild, into a new table swapped in for the old one (which can then
+    be restored with rollback). ttl is how old a cached copy of the page
+    may be (see scraper.iter_presidents)."""
+    database.create_table()
+    digest = hashlib.sha256()
+    errors = []
+    load = database.rebuild_presidents if rebuild else database.sync_presidents
+    # only delete presidents missing from a scrape that had no errors, a
+    # row that failed to parse is not a president that is gone
+    counts = load(
+        hash_records(skip_errors(iter_presidents(ttl=ttl), errors), digest),
+        delete_missing=lambda: not errors)
+    for error in errors:
+        print(f"error: {error['error']}")
+    if not any(counts.values()):
+        # nothing was scraped, keep the old data and try again after
+        # RETRY_INTERVAL
+        database.set_metadata({"refresh_failed_at": time.time()})
+        return None
+
+    # download any new portraits so the game can show local copies
+    images.prefetch_portraits()
+    source_hash = digest.hexdigest()
+    previous_hash = database.get_metadata("source_hash", "")
+    counts["changed"] = source_hash != previous_hash
+    counts["errors"] = len(errors)
+    metadata = {"refreshed_at": time.time(), "source_hash": source_hash,
+                "ingest_version": INGEST_VERSION}
+    if rebuild:
+        # the hash of the table kept for rollback
+        metadata["previous_source_hash"] = previous_hash
+    database.set_metadata(metadata)
+    # questions made from the old data may be out of date (cleared after
+    # the new stamp is stored, so questions built before it are dropped)
+    questions.POOL.clear()
+    return counts
+
+
+def rollback():
+    """Swap back the presidents table replaced by the last rebuild.
+    Returns False if there is nothing to roll back to."""
+    with _refresh_lock:
+        if not database.rollback_presidents():
+            return False
+        values = database.get_metadata_values(("source_hash",
+                                               "previous_source_hash"))
+        # a new refreshed_at also makes the dataset cache reload
+        database.set_metadata({
+            "refreshed_at": time.time(),
+            "source_hash": values.get("previous_source_hash", ""),
+            "previous_source_hash": values.get("source_hash", "")})
+        questions.POOL.clear()
+        return True
+
+
+def ensure_fresh(ttl=None):
+    """Refresh the database only if it is stale. Returns the refresh
+    summary, or None when the data was already fresh."""
+    if not is_stale(ttl):
+        return None  # fast path, the data is fresh
+    with _refresh_lock:
+        # another session may have refreshed while we waited
+        if not is_stale(ttl):
+            return None
+        return refresh_database()
+
+
+def main(argv=None):
+    # command line entry point:
+    # python refresh.py [--force] [--rebuild] [--rollback] [--ttl SECONDS]
+    #                    [--prefetch-events] [--prefetch-images]
+    arg_parser = argparse.ArgumentParser(
+        description="Refresh the presidents database.")
+    arg_parser.add_argument("--force", action="store_true",
+                            help="refresh even if the data is still fresh")
+    arg_parser.add_argument("--rebuild", action="store_true",
+                            help="refresh into a new table and swap it in, "
+                                 "keeping the old one for --rollback")
+    arg_parser.add_argument("--rollback", action="store_true",
+                            help="restore the table replaced by the last "
+                                 "--rebuild")
+    arg_parser.add_argument("--ttl", type=float, default=None,
+                            help="seconds before the data is stale")
+    arg_parser.add_argument("--prefetch-events", action="store_true",
+                            help="cache the events of every term's years")
+    arg_parser.add_argument("--prefetch-images", action="store_true",
+                            help="download every missing portrait")
+    args = arg_parser.parse_args(argv)
+
+    if args.rollback:
+        if rollback():
+            print("Rolled back to the previous presidents table.")
+        else:
+            print("Nothing to roll back to.")
+        return
+
+    if args.force or args.rebuild:
+        # a forced refresh checks Wikipedia instead of the cached page
+        summary = refresh_database(rebuild=args.rebuild, ttl=0)
+    else:
+        summary = ensure_fresh(args.ttl)
+    if summary is None and not (args.force or args.rebuild):
+        print("Database is fresh, nothing to do.")
+    elif summary is None:
+        print("Refresh failed, no presidents were scraped.")
+    else:
+        print(f"Refreshed: {summary['inserted']} inserted, "
+              f"{summary['updated']} updated, "
+              f"{summary['deleted']} deleted, "
+              f"{summary['skipped']} unchanged, "
+              f"{summary['errors']} rows failed.")
+
+    if args.prefetch_events:
+        events_by_year = api.prefetch_events()
+        print(f"Cached events for {len(events_by_year)} years.")
+
+    if args.prefetch_images:
+        counts = images.prefetch_portraits()
+        print(f"Downloaded {counts['downloaded']} portraits, "
+              f"{counts['failed']} failed.")
+
+
+if __name__ == "__main__":
+    main()
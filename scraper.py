@@ -1,26 +1,71 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import re
+import requests
+import http_cache
+from models import President
 
 # wikipedia page containing the list of presidents
 URL = "https://en.wikipedia.org/wiki/List_of_presidents_of_the_United_States"
 
+# cache for the wikipedia page, set to None to always download it
+RESPONSE_CACHE = http_cache.FileCache()
+
+
+def has_wikitable_class(classes):
+    """True for a class attribute containing "wikitable"; the strainer sees
+    the raw attribute string, so "wikitable sortable" has to be split."""
+    if classes is None:
+        return False
+    if isinstance(classes, str):
+        classes = classes.split()
+    return "wikitable" in classes
+
+
+WIKITABLES = SoupStrainer("table", class_=has_wikitable_class)
+# ways to parse the page: the beautifulsoup parser to use, and whether to
+# only build the wikitable tables instead of a tree of the whole page
+# (the lxml ones need the optional lxml package)
+PARSER_BACKENDS = {
+    "html.parser": ("html.parser", None),
+    "strainer": ("html.parser", WIKITABLES),
+    "lxml": ("lxml", None),
+    "lxml-strainer": ("lxml", WIKITABLES),
+}
+DEFAULT_BACKEND = "strainer"
+
+
+# patterns used by the cleaning functions, compiled once
+FOOTNOTE_RE = re.compile(r'\[.*?\]')  # footnotes inside square brackets
+PARENTHESES_RE = re.compile(r'\(.*?\)')  # text inside parentheses
+YEAR_RE = re.compile(r'(?<=\D)(\d{4})')  # a year glued to the text before it
+JOINED_YEARS_RE = re.compile(r'(\d{4})(?=\d{4})')  # years without a space
+BIRTH_DEATH_RE = re.compile(r'(b\.)?\s*(\d{4})\s*[\u2013-]?\s*(\d{4})?')
+
+
+def _strip_footnotes(text):
+    """Remove footnotes and collapse whitespace (what clean_text does
+    before it drops parentheses)."""
+    if "[" in text:
+        text = FOOTNOTE_RE.sub('', text)
+    return " ".join(text.split())
+
 
 def clean_text(text):
     """Remove footnotes, unwanted characters, and extra spaces from text."""
-    text = re.sub(r'\[.*?\]', '',
-                  text)  # Remove all footnotes inside square brackets
     text = text.replace("\u00a0", " ").replace(
         "\u2013", "-")  # Normalize spaces and dashes
-    text = re.sub(r'\s+', ' ', text).strip()  # Collapse multiple spaces
-    text = re.sub(r'\(.*?\)', '', text)  # Remove text inside parentheses
-    return text.strip() or "N/A"  # return the clean text or n/a
+    text = _strip_footnotes(text)
+    if "(" in text:
+        text = PARENTHESES_RE.sub('', text).strip()
+    return text or "N/A"  # return the clean text or n/a
 
 
 def clean_vice_president(vp_text):
     """Cleans and formats vice president names."""
-    # Ensure spacing before years
-    return clean_text(re.sub(r'(?<=\D)(\d{4})', r' \1', vp_text))
+    # ensure spacing before years, then tidy the spaces that adds; the
+    # parentheses are already gone after the first clean_text
+    text = YEAR_RE.sub(r' \1', clean_text(vp_text))
+    return _strip_footnotes(text) or "N/A"
 
 
 def extract_birth_death(tag):
@@ -30,7 +75,7 @@ def extract_birth_death(tag):
 
     text = tag.get_text(strip=True)
     # extract birth and death year
-    match = re.search(r'(b\.)?\s*(\d{4})\s*[\u2013-]?\s*(\d{4})?', text)
+    match = BIRTH_DEATH_RE.search(text)
     if match:
         birth_year = match.group(2)
         death_year = match.group(3)
@@ -58,83 +103,126 @@ def clean_election(election):
     election = election.replace("\u00a0", " ").replace(
         "\u2013", " ")  # normalize spacing
     # add spacing between concatenated election years
-    return re.sub(r'(\d{4})(?=\d{4})', r'\1 ', election).strip() or "N/A"
-
+    return JOINED_YEARS_RE.sub(r'\1 ', election).strip() or "N/A"
 
-def scrape_presidents():
-    # send request to wikipedia page
-    response = requests.get(URL)
-    if response.status_code != 200:
-        print("Failed to retrieve data")
-        return []
 
+def find_presidents_table(html, backend=DEFAULT_BACKEND):
+    """Parse the page with one of PARSER_BACKENDS and return the first
+    wikitable, or None if there isn't one."""
+    features, parse_only = PARSER_BACKENDS[backend]
     # parse the html with beautifulsoup
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(html, features, parse_only=parse_only)
+    # find the first table
+    return soup.find("table", class_="wikitable")
+
+
+def error_record(message, row=None):
+    """A record describing something that went wrong while scraping, with
+    the index of the table row it happened on (None for the whole page)."""
+    return {"error": message, "row": row}
+
+
+def is_error(record):
+    """True for the error records iter_presidents yields."""
+    return isinstance(record, dict) and "error" in record
+
+
+def parse_president_row(president):
+    """Turn one <tr> of the presidents table into a President, or None if
+    the row doesn't have enough columns. Raises on malformed rows."""
+    cols = president.find_all(["th", "td"])
+    if len(cols) < 7:
+        return None  # skip rows that don't have enough columns
+
+    # what number president they are
+    number = int(clean_text(cols[0].get_text(strip=True)))
+
+    # image of the president
+    img_tag = cols[1].find("img")
+    picture = "https:" + img_tag["src"]
+
+    # name of the president
+    name_tag = cols[2].find("b") or cols[2]
+    name = clean_text(name_tag.get_text(strip=True))
+
+    # birth/death of the president
+    birth_death_tag = cols[2].find("span", style="font-size: 85%;")
+    birth_death = extract_birth_death(birth_death_tag)
+
+    # dates of their term
+    term = format_term(clean_text(cols[3].get_text(strip=True)))
+
+    # if a row has extra style columns, then drop the column
+    if cols[4].has_attr("style"):
+        cols.pop(4)
+
+    # president's political party
+    party = clean_text(cols[4].get_text(strip=True))
+
+    # election year(s)
+    election = clean_election(cols[5].get_text(strip=True))
+
+    # vice president(s)
+    vice_president_tag = cols[6] if len(cols) > 6 else None
+    vice_president = clean_vice_president(
+        vice_president_tag.get_text(separator=" "))
+
+    # this president's data (the term dates are parsed when stored)
+    return President(
+        number=number,
+        picture=picture,
+        name=name,
+        birth_death=birth_death,
+        term=term,
+        party=party,
+        election=election,
+        vice_president=vice_president
+    )
+
+
+def iter_presidents(backend=DEFAULT_BACKEND, ttl=None):
+    """Yield each president's record as its table row is parsed. Problems
+    are yielded as error records (see is_error) instead of being printed,
+    and the rows after a bad one are still parsed. The page is reused
+    from the response cache for ttl seconds (http_cache.CACHE_TTL by
+    default), 0 always asks Wikipedia whether it changed."""
+    # send request to wikipedia page (or reuse the cached copy)
+    try:
+        response = http_cache.cached_get(URL, RESPONSE_CACHE, ttl=ttl)
+    except requests.exceptions.RequestException as e:
+        # no connection and nothing cached, report it like a failed reply
+        yield error_record(
+            f"Failed to retrieve data: {type(e).__name__}: {e}")
+        return
+    if response.status_code != 200:
+        yield error_record("Failed to retrieve data")
+        return
 
-    # finf the first table
-    table = soup.find("table", class_="wikitable")
+    table = find_presidents_table(response.text, backend)
     if not table:
-        print("Could not find the presidents table.")
-        return []
-
-    # make a list to store the presidents
-    presidents = []
+        yield error_record("Could not find the presidents table.")
+        return
 
     # skip the header row and loop over each table row
-    for president in table.find_all("tr")[1:]:
-        cols = president.find_all(["th", "td"])
-        if len(cols) < 7:
-            continue  # skip rows that don't have enough columns
+    for index, president in enumerate(table.find_all("tr")[1:], start=1):
         try:
-            # what number president they are
-            number = clean_text(cols[0].get_text(strip=True))
-
-            # image of the president
-            img_tag = cols[1].find("img")
-            picture = "https:" + img_tag["src"]
-
-            # name of the president
-            name_tag = cols[2].find("b") or cols[2]
-            name = clean_text(name_tag.get_text(strip=True))
-
-            # birth/death of the president
-            birth_death_tag = cols[2].find("span", style="font-size: 85%;")
-            birth_death = extract_birth_death(birth_death_tag)
-
-            # dates of their term
-            term = format_term(clean_text(cols[3].get_text(strip=True)))
-
-            # if a row has extra style columns, then drop the column
-            if cols[4].has_attr("style"):
-                cols.pop(4)
-
-            # president's political party
-            party = clean_text(cols[4].get_text(strip=True))
-
-            # election year(s)
-            election = clean_election(cols[5].get_text(strip=True))
-
-            # vice president(s)
-            vice_president_tag = cols[6] if len(cols) > 6 else None
-            vice_president = clean_vice_president(
-                clean_text(vice_president_tag.get_text(separator=" ")))
-
-            # append this president's data as a dictionary
-            presidents.append({
-                "number": number,
-                "picture": picture,
-                "name": name,
-                "birth_death": birth_death,
-                "term": term,
-                "party": party,
-                "election": election,
-                "vice_president": vice_president
-            })
-
+            record = parse_president_row(president)
         except Exception as e:
-            # print any row specific error but keep processing
-            print(f"error: {e}")
+            # report any row specific error but keep processing
+            yield error_record(f"{type(e).__name__}: {e}", index)
             continue
+        if record is not None:
+            yield record
+
 
-    # return the list of presidents
+def scrape_presidents(backend=DEFAULT_BACKEND):
+    """Return the list of scraped presidents, printing any errors."""
+    presidents = []
+    for record in iter_presidents(backend):
+        if is_error(record) and record["row"] is None:
+            print(record["error"])
+        elif is_error(record):
+            print(f"error: {record['error']}")
+        else:
+            presidents.append(record)
     return presidents
@@ -31,25 +31,27 @@ def test_initialize_session_state(mock_st):
     assert mock_st.session_state["show_ai_hint"] is False
 
 @patch.object(Game, "st")
-@patch("pages.Game.database.fetch_random_president")
-@patch("pages.Game.database.fetch_wrong_presidents")
-def test_load_new_question(mock_wrong, mock_fetch, mock_st):
+@patch("pages.Game.questions.get_question")
+def test_load_new_question(mock_get_question, mock_st):
     mock_st.session_state = MockSessionState()
-    mock_fetch.return_value = {
+    mock_get_question.return_value = {
+        "number": 1,
         "name": "George Washington",
         "picture": "http://image.jpg",
+        "choices": ["John Adams", "George Washington", "Thomas Jefferson"],
         "hint": "First president",
         "hint_column": "Fun Fact"
     }
-    mock_wrong.return_value = ["John Adams", "Thomas Jefferson"]
     mock_st.session_state["answer"] = {}
     mock_st.session_state["hint"] = None
     mock_st.session_state["show_ai_hint"] = False
     Game.load_new_question()
     answer = mock_st.session_state["answer"]
+    assert answer["number"] == 1
     assert answer["name"] == "George Washington"
     assert len(answer["choices"]) == 3
     assert "George Washington" in answer["choices"]
+    assert answer["guessed"] is False
     assert mock_st.session_state["hint"] == "First president"
     assert mock_st.session_state["show_ai_hint"] is False
 
@@ -164,3 +166,19 @@ def test_get_a_hint_button_calls_show_hint(mock_show_hint, mock_st):
     with patch.object(mock_st, "write"):
         Game.render_game_ui()
     mock_show_hint.assert_called_once()
+
+@patch.object(Game, "st")
+@patch.object(Game.images, "portrait_source")
+def test_render_game_ui_shows_local_portrait(mock_portrait, mock_st):
+    mock_st.session_state = MockSessionState(
+        answer={"number": 1, "name": "George Washington",
+                "picture": "http://fakeurl.com/image.jpg",
+                "choices": ["George Washington"], "guessed": False},
+        hint=None, correct_count=0, incorrect_count=0, show_ai_hint=False)
+    mock_st.session_state.get = lambda key, default=None: getattr(
+        mock_st.session_state, key, default)
+    mock_st.button.return_value = False
+    mock_portrait.return_value = b"portrait bytes"
+    Game.render_game_ui()
+    mock_portrait.assert_called_once_with(1, "http://fakeurl.com/image.jpg")
+    mock_st.image.assert_called_once_with(b"portrait bytes", width=300)
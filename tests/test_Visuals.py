@@ -1,4 +1,5 @@
 import pages.Visuals as Visuals
+import pytest
 import pandas as pd
 import utils
 from pandas.testing import assert_frame_equal
@@ -31,12 +32,10 @@ def test_get_binned_counts():
     })
     assert_frame_equal(result, expected)
 
-def test_get_party_counts():
-    df = pd.DataFrame({
-        "name": ["A", "B", "C", "D"],
-        "party": ["Democrat", "Republican", "Democrat", "Independent"]
-    })
-    result = Visuals.get_party_counts(df)
+def test_get_party_counts(monkeypatch):
+    monkeypatch.setattr(Visuals.database, "fetch_party_counts", lambda: [
+        ("Democrat", 2), ("Independent", 1), ("Republican", 1)])
+    result = Visuals.get_party_counts()
     expected = pd.DataFrame({
         "party": ["Democrat", "Independent", "Republican"],
         "count": [2, 1, 1]
@@ -60,6 +59,19 @@ def test_parse_term_dates(monkeypatch):
     assert result["Start"].dt.year.tolist() == [2001, 2009]
     assert result["End"].dt.year.tolist() == [2005, 2017]
 
+def test_parse_term_dates_from_term_columns(monkeypatch):
+    df = pd.DataFrame({
+        "name": ["X", "Y"],
+        "term": ["2001-2005", "2025-Incumbent"],
+        "term_start": ["2001-01-20", "2025-01-20"],
+        "term_end": ["2005-01-20", None]
+    })
+    monkeypatch.setattr(utils, "parse_term_dates",
+                        lambda term: pytest.fail("term was re-parsed"))
+    result = Visuals.parse_term_dates(df.copy())
+    assert result["Start"].dt.year.tolist() == [2001, 2025]
+    assert result["End"].dt.year.tolist() == [2005, 2026]
+
 def test_plot_years_served_chart():
     df = pd.DataFrame({
         "Years Served Group": ["1-4", "5-8", "9-12"],
@@ -1,5 +1,28 @@
 from unittest.mock import patch, MagicMock
+import json
+import threading
+import time
+import pytest
+import requests
 import api
+import database
+from models import President
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def president(**fields):
+    # a stored president with only the given fields filled in
+    return President(1, *["N/A"] * 7)._replace(**fields)
+
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    # keep the events cache of each test separate
+    monkeypatch.setattr(database, "DATABASE_NAME",
+                        str(tmp_path / "presidents.db"))
+    database.create_table()
+    yield
+    database.close_connections()
 
 @patch("api.requests.get")
 def test_get_events_success(mock_get):
@@ -11,7 +34,8 @@ def test_get_events_success(mock_get):
     result = api.get_events(2020)
     assert result == {"events": [
         {"content": "Event 1"}, {"content": "Event 2"}]}
-    mock_get.assert_called_once_with("https://events.historylabs.io/year/2020")
+    mock_get.assert_called_once_with("https://events.historylabs.io/year/2020",
+                                     timeout=api.REQUEST_TIMEOUT)
 
 @patch("api.requests.get")
 def test_get_events_failure(mock_get):
@@ -21,20 +45,22 @@ def test_get_events_failure(mock_get):
     mock_response.json.return_value = None
     result = api.get_events(2020)
     assert result is None
-    mock_get.assert_called_once_with("https://events.historylabs.io/year/2020")
+    mock_get.assert_called_once_with("https://events.historylabs.io/year/2020",
+                                     timeout=api.REQUEST_TIMEOUT)
 
-@patch("api.get_events")
+@patch("api.fetch_events")
 @patch("api.parse_term_dates")
 def test_get_events_for_term(mock_parse_term_dates, mock_get_events):
     mock_parse_term_dates.return_value = (2020, 2024)
-    mock_get_events.side_effect = [
-        {"events": [{"content": "Event 1"}, {
+    # years are fetched concurrently, so answer by year not call order
+    mock_get_events.side_effect = {
+        2020: {"events": [{"content": "Event 1"}, {
             "content": "Event 2"}]},
-        {"events": [{"content": "Event A"}]},
-        {"events": [{"content": "Event B"}]},
-        {"events": [{"content": "Event C"}]},
-        {"events": [{"content": "Event D"}]},
-    ]
+        2021: {"events": [{"content": "Event A"}]},
+        2022: {"events": [{"content": "Event B"}]},
+        2023: {"events": [{"content": "Event C"}]},
+        2024: {"events": [{"content": "Event D"}]},
+    }.get
     result = api.get_events_for_term("2020-2024")
     assert result == {
         2020: ["Event 1", "Event 2"],
@@ -43,42 +69,84 @@ def test_get_events_for_term(mock_parse_term_dates, mock_get_events):
         2023: ["Event C"]
     }
 
-@patch("api.scrape_presidents")
-@patch("api.get_events_for_term")
-def test_get_events_for_president(mock_get_events_for_term,
-                                  mock_scrape_presidents):
-    mock_scrape_presidents.return_value = [
-        {"name": "Abraham Lincoln", "number": 16, "term": "1861-1865"},
-        {"name": "Theodore Roosevelt", "number": 26, "term": "1901-1909"}
-    ]
-    mock_get_events_for_term.side_effect = [
-        {1861: ["Event 1"]},
-        {1901: ["Event A"]},
+@patch("api.dataset.find_by_name")
+@patch("api.get_events_for_years")
+def test_get_events_for_president(mock_get_events_for_years,
+                                  mock_find_by_name):
+    mock_find_by_name.return_value = [
+        president(name="Abraham Lincoln", number=16, term="1861-1863")
     ]
+    mock_get_events_for_years.return_value = {1861: ["Event 1"], 1862: []}
     result = api.get_events_for_president("Abraham Lincoln")
     expected_result = {
         "name": "Abraham Lincoln",
         "terms": [
             {
                 "number": 16,
-                "term": "1861-1865",
-                "events": {1861: ["Event 1"]}
+                "term": "1861-1863",
+                "events": {1861: ["Event 1"], 1862: []}
             }
         ]
     }
     assert result == expected_result
-    mock_get_events_for_term.assert_called_once_with("1861-1865")
-    mock_scrape_presidents.assert_called_once()
-
-@patch("api.scrape_presidents")
-def test_get_events_for_president_not_found(mock_scrape_presidents):
-    mock_scrape_presidents.return_value = [
-        {"name": "Abraham Lincoln", "number": 16, "term": "1861-1865"},
-        {"name": "Theodore Roosevelt", "number": 26, "term": "1901-1909"}
+    assert list(mock_get_events_for_years.call_args[0][0]) == [1861, 1862]
+    mock_find_by_name.assert_called_once_with("Abraham Lincoln")
+
+@patch("api.fetch_events")
+@patch("api.dataset.find_by_name")
+def test_get_events_for_president_fetches_shared_years_once(
+        mock_find_by_name, mock_fetch):
+    mock_find_by_name.return_value = [
+        president(name="Grover Cleveland", number=22, term="1885 - 1889"),
+        president(name="Grover Cleveland", number=24, term="1888 - 1890")
     ]
+    mock_fetch.side_effect = lambda year: {
+        "events": [{"content": f"Event {year}"}]}
+    result = api.get_events_for_president("Grover Cleveland")
+    assert list(result["terms"][0]["events"]) == [1885, 1886, 1887, 1888]
+    assert result["terms"][1]["events"] == {1888: ["Event 1888"],
+                                            1889: ["Event 1889"]}
+    assert sorted(call.args[0] for call in mock_fetch.call_args_list) == [
+        1885, 1886, 1887, 1888, 1889]
+
+@patch("api.fetch_events")
+def test_get_events_for_range_only_fetches_missing_years(mock_fetch):
+    mock_fetch.side_effect = lambda year: {
+        "events": [{"content": f"Event {year}"}]}
+    api.get_events_for_range(1861, 1863)
+    result = api.get_events_for_range(1861, 1865)
+    assert result == {year: [f"Event {year}"] for year in range(1861, 1865)}
+    assert [call.args[0] for call in mock_fetch.call_args_list] == [
+        1861, 1862, 1863, 1864]
+    assert api.get_events_for_range(1865, 1865) == {}
+
+def test_overlapping_requests_share_in_flight_fetches(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(year):
+        calls.append(year)
+        release.wait(5)
+        return {"events": [{"content": f"Event {year}"}]}
+    monkeypatch.setattr(api, "fetch_events", slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        api.get_events_for_range(1861, 1864))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)  # let every request reach the in-flight check
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == [1861, 1862, 1863]
+    assert all(result == results[0] for result in results)
+
+@patch("api.dataset.find_by_name")
+def test_get_events_for_president_not_found(mock_find_by_name):
+    mock_find_by_name.return_value = []
     result = api.get_events_for_president("George Washington")
     assert result is None
-    mock_scrape_presidents.assert_called_once()
+    mock_find_by_name.assert_called_once_with("George Washington")
 
 @patch("api.requests.get")
 def test_get_events_empty_response(mock_get):
@@ -88,11 +156,14 @@ def test_get_events_empty_response(mock_get):
     mock_get.return_value = mock_response
     result = api.get_events(2020)
     assert result == {"events": []}
-    mock_get.assert_called_once_with("https://events.historylabs.io/year/2020")
+    mock_get.assert_called_once_with("https://events.historylabs.io/year/2020",
+                                     timeout=api.REQUEST_TIMEOUT)
 
-def test_get_events_invalid_year():
+@patch("api.fetch_events")
+def test_get_events_invalid_year(mock_fetch):
     result = api.get_events("not_a_year")
     assert result is None
+    mock_fetch.assert_not_called()
 
 def mock_parse_term_dates(term, just_years=True):
     start_str, end_str = term.split("-")
@@ -109,7 +180,7 @@ def mock_parse_term_dates(term, just_years=True):
         return start, end
 
 @patch("api.parse_term_dates", side_effect=mock_parse_term_dates)
-@patch("api.get_events")
+@patch("api.fetch_events")
 def test_get_events_for_term_incumbent(mock_get_events, mock_parse_term_dates):
     term = "2020-Incumbent"
     mock_get_events.return_value = {"events": [{"content": "Event 1"}]}
@@ -118,3 +189,142 @@ def test_get_events_for_term_incumbent(mock_get_events, mock_parse_term_dates):
     assert result == expected_result
     mock_get_events.assert_called_once_with(2020)
     mock_parse_term_dates.assert_called_once_with(term, True)
+
+
+class FakeEventsHandler(BaseHTTPRequestHandler):
+    # answers /year/<year> after a delay, failing the first
+    # server.failures requests with 503
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            fail = server.hits <= server.failures
+        time.sleep(server.delay)
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        year = self.path.rsplit("/", 1)[-1]
+        body = json.dumps({"events": [{"content": f"Event {year}"}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass  # keep test output quiet
+
+@pytest.fixture
+def events_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEventsHandler)
+    server.lock = threading.Lock()
+    server.hits = 0
+    server.failures = 0
+    server.delay = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(
+        api, "EVENTS_URL",
+        f"http://127.0.0.1:{server.server_port}/year/{{year}}")
+    monkeypatch.setattr(api, "BACKOFF", 0.01)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_get_events_for_term_concurrent_speedup(events_server):
+    events_server.delay = 0.2
+    start = time.perf_counter()
+    serial = api.get_events_for_term("1789 - 1797", max_workers=1)
+    serial_time = time.perf_counter() - start
+    start = time.perf_counter()
+    # different years, so none of them come from the events cache
+    concurrent = api.get_events_for_term("1797 - 1805", max_workers=8)
+    concurrent_time = time.perf_counter() - start
+    assert list(serial) == list(range(1789, 1797))
+    assert list(concurrent) == list(range(1797, 1805))
+    assert concurrent[1800] == ["Event 1800"]
+    assert events_server.hits == 16
+    # 8 years at 0.2s each: ~1.6s serially, ~0.2s concurrently
+    assert concurrent_time < serial_time / 3
+
+def test_get_events_retries_server_errors(events_server):
+    events_server.failures = 2
+    assert api.get_events(1800) == {"events": [{"content": "Event 1800"}]}
+    assert events_server.hits == 3
+
+def test_get_events_gives_up_after_retries(events_server):
+    events_server.failures = 10
+    assert api.get_events(1800, retries=1) is None
+    assert events_server.hits == 2
+
+def test_get_events_times_out(events_server):
+    events_server.delay = 0.5
+    start = time.perf_counter()
+    assert api.get_events(1800, timeout=0.05, retries=0) is None
+    assert time.perf_counter() - start < 0.5
+
+@patch("api.requests.get")
+def test_get_events_does_not_retry_client_errors(mock_get):
+    error = requests.exceptions.HTTPError(response=MagicMock(status_code=404))
+    mock_get.return_value.raise_for_status.side_effect = error
+    assert api.get_events(2020) is None
+    mock_get.assert_called_once()
+
+@patch("api.fetch_events")
+def test_get_events_reads_through_cache(mock_fetch):
+    mock_fetch.return_value = {"events": [{"content": "Event 1"},
+                                          {"content": "Event 2"}]}
+    first = api.get_events(1861)
+    second = api.get_events("1861")
+    assert first == second == {"events": [{"content": "Event 1"},
+                                          {"content": "Event 2"}]}
+    mock_fetch.assert_called_once()
+
+@patch("api.fetch_events")
+def test_get_events_caches_failures(mock_fetch, monkeypatch):
+    mock_fetch.return_value = None
+    assert api.get_events(1861) is None
+    assert api.get_events(1861) is None
+    mock_fetch.assert_called_once()
+    # once the failure has expired the year is requested again
+    monkeypatch.setattr(api, "FAILURE_TTL", -1)
+    mock_fetch.return_value = {"events": []}
+    assert api.get_events(1861) == {"events": []}
+    assert mock_fetch.call_count == 2
+
+@patch("api.fetch_events")
+def test_get_events_for_term_uses_one_query_when_cached(mock_fetch,
+                                                        monkeypatch):
+    mock_fetch.side_effect = lambda year: {
+        "events": [{"content": f"Event {year}"}]}
+    first = api.get_events_for_term("1861 - 1865")
+    queries = []
+    monkeypatch.setattr(database, "fetch_cached_events",
+                        lambda *args, real=database.fetch_cached_events:
+                        queries.append(args) or real(*args))
+    second = api.get_events_for_term("1861 - 1865")
+    assert first == second
+    assert second[1862] == ["Event 1862"]
+    assert mock_fetch.call_count == 4
+    assert len(queries) == 1
+
+@patch("api.fetch_events")
+@patch("api.dataset.get_presidents")
+def test_prefetch_events(mock_presidents, mock_fetch):
+    mock_presidents.return_value = [president(term="1861 - 1865"),
+                                    president(term="1863 - 1866")]
+    mock_fetch.return_value = {"events": []}
+    result = api.prefetch_events()
+    assert list(result) == [1861, 1862, 1863, 1864, 1865]
+    assert mock_fetch.call_count == 5
+    assert database.fetch_cached_events(1861, 1866, 60) == {
+        year: [] for year in range(1861, 1866)}
+
+def test_president_years_uses_stored_dates():
+    with patch("api.parse_term_dates") as mock_parse:
+        assert api.president_years(president(
+            term="ignored", term_start="1861-03-04",
+            term_end="1865-04-15")) == range(1861, 1865)
+        assert api.president_years(president(
+            term="ignored", term_start="2025-01-20")) == range(2025, 2026)
+    mock_parse.assert_not_called()
@@ -3,15 +3,19 @@ import sqlite3
 import database
 import os
 import pandas as pd
+import random
+from models import President
 
 DATABASE_NAME = "presidents.db"
 
 @pytest.fixture(autouse=True)
 def setup_database():
+    database.close_connections()
     if os.path.exists(database.DATABASE_NAME):
         os.remove(database.DATABASE_NAME)
     database.create_table()
     yield
+    database.close_connections()
     if os.path.exists(database.DATABASE_NAME):
         os.remove(database.DATABASE_NAME)
 
@@ -23,21 +27,22 @@ def test_create_table():
     conn.close()
     expected_columns = [
         "number", "picture", "name", "birth_death", "term", "party",
-        "election", "vice_president"
+        "election", "vice_president", "term_start", "term_end",
+        "is_incumbent", "content_hash"
     ]
     assert columns == expected_columns
 
 def test_insert_president():
-    president = {
-        "number": 1,
-        "picture": "image_url",
-        "name": "George Washington",
-        "birth_death": "1732-1799",
-        "term": "1789-1797",
-        "party": "None",
-        "election": "1788",
-        "vice_president": "John Adams"
-    }
+    president = President(
+        number=1,
+        picture="image_url",
+        name="George Washington",
+        birth_death="1732-1799",
+        term="1789-1797",
+        party="None",
+        election="1788",
+        vice_president="John Adams"
+    )
     database.insert_president(president)
     conn = sqlite3.connect(database.DATABASE_NAME)
     cursor = conn.cursor()
@@ -49,16 +54,16 @@ def test_insert_president():
     assert result[0] == "George Washington"
 
 def test_fetch_all_presidents():
-    president = {
-        "number": 2,
-        "picture": "image_url",
-        "name": "John Adams",
-        "birth_death": "1735-1826",
-        "term": "1797-1801",
-        "party": "Federalist",
-        "election": "1796",
-        "vice_president": "Thomas Jefferson"
-    }
+    president = President(
+        number=2,
+        picture="image_url",
+        name="John Adams",
+        birth_death="1735-1826",
+        term="1797-1801",
+        party="Federalist",
+        election="1796",
+        vice_president="Thomas Jefferson"
+    )
     database.insert_president(president)
     df = database.fetch_all_presidents()
     assert isinstance(df, pd.DataFrame)
@@ -67,16 +72,16 @@ def test_fetch_all_presidents():
     assert len(df) > 0
 
 def test_fetch_president_names():
-    president = {
-        "number": 3,
-        "picture": "image_url",
-        "name": "Thomas Jefferson",
-        "birth_death": "1743-1826",
-        "term": "1801-1809",
-        "party": "Democratic-Republican",
-        "election": "1800",
-        "vice_president": "Aaron Burr"
-    }
+    president = President(
+        number=3,
+        picture="image_url",
+        name="Thomas Jefferson",
+        birth_death="1743-1826",
+        term="1801-1809",
+        party="Democratic-Republican",
+        election="1800",
+        vice_president="Aaron Burr"
+    )
     database.insert_president(president)
     result = database.fetch_president_names()
     assert "Thomas Jefferson" in result
@@ -84,16 +89,16 @@ def test_fetch_president_names():
     assert len(result) > 0
 
 def test_fetch_random_president():
-    president = {
-        "number": 4,
-        "picture": "image_url",
-        "name": "James Madison",
-        "birth_death": "1751-1836",
-        "term": "1809-1817",
-        "party": "Democratic-Republican",
-        "election": "1808",
-        "vice_president": "George Clinton"
-    }
+    president = President(
+        number=4,
+        picture="image_url",
+        name="James Madison",
+        birth_death="1751-1836",
+        term="1809-1817",
+        party="Democratic-Republican",
+        election="1808",
+        vice_president="George Clinton"
+    )
     database.insert_president(president)
     result = database.fetch_random_president()
     assert result is not None
@@ -102,36 +107,36 @@ def test_fetch_random_president():
     assert "hint_column" in result
 
 def test_fetch_wrong_presidents():
-    correct_president = {
-        "number": 5,
-        "picture": "image_url",
-        "name": "James Monroe",
-        "birth_death": "1758-1831",
-        "term": "1817-1825",
-        "party": "Democratic-Republican",
-        "election": "1816",
-        "vice_president": "Daniel D. Tompkins"
-    }
-    wrong_president_1 = {
-        "number": 6,
-        "picture": "image_url",
-        "name": "John Quincy Adams",
-        "birth_death": "1767-1848",
-        "term": "1825-1829",
-        "party": "Democratic-Republican",
-        "election": "1824",
-        "vice_president": "John C. Calhoun"
-    }
-    wrong_president_2 = {
-        "number": 7,
-        "picture": "image_url",
-        "name": "Andrew Jackson",
-        "birth_death": "1767-1845",
-        "term": "1829-1837",
-        "party": "Democratic",
-        "election": "1828",
-        "vice_president": "Martin Van Buren"
-    }
+    correct_president = President(
+        number=5,
+        picture="image_url",
+        name="James Monroe",
+        birth_death="1758-1831",
+        term="1817-1825",
+        party="Democratic-Republican",
+        election="1816",
+        vice_president="Daniel D. Tompkins"
+    )
+    wrong_president_1 = President(
+        number=6,
+        picture="image_url",
+        name="John Quincy Adams",
+        birth_death="1767-1848",
+        term="1825-1829",
+        party="Democratic-Republican",
+        election="1824",
+        vice_president="John C. Calhoun"
+    )
+    wrong_president_2 = President(
+        number=7,
+        picture="image_url",
+        name="Andrew Jackson",
+        birth_death="1767-1845",
+        term="1829-1837",
+        party="Democratic",
+        election="1828",
+        vice_president="Martin Van Buren"
+    )
     database.insert_president(correct_president)
     database.insert_president(wrong_president_1)
     database.insert_president(wrong_president_2)
@@ -141,14 +146,14 @@ def test_fetch_wrong_presidents():
     assert "James Monroe" not in wrong_names
 
 @pytest.mark.parametrize("president, expected_name", [
-    ({"number": 6,
-      "picture": "image_url",
-      "name": "John Quincy Adams",
-      "birth_death": "1767-1848",
-      "term": "1825-1829",
-      "party": "Democratic-Republican",
-      "election": "1824",
-      "vice_president": "Daniel D. Tompkins"},
+    (President(number=6,
+      picture="image_url",
+      name="John Quincy Adams",
+      birth_death="1767-1848",
+      term="1825-1829",
+      party="Democratic-Republican",
+      election="1824",
+      vice_president="Daniel D. Tompkins"),
      "John Quincy Adams"),
 ])
 def test_insert_president_parametrized(president, expected_name):
@@ -156,7 +161,7 @@ def test_insert_president_parametrized(president, expected_name):
     conn = sqlite3.connect(database.DATABASE_NAME)
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM presidents WHERE name = ?",
-                   (president["name"],))
+                   (president.name,))
     result = cursor.fetchone()
     conn.close()
     assert result is not None
@@ -171,16 +176,16 @@ def count_records_in_presidents():
     return count
 
 def test_reset_database_when_table_exists():
-    president = {
-        "number": 1,
-        "picture": "image_url",
-        "name": "George Washington",
-        "birth_death": "1732-1799",
-        "term": "1789-1797",
-        "party": "None",
-        "election": "1788",
-        "vice_president": "John Adams"
-    }
+    president = President(
+        number=1,
+        picture="image_url",
+        name="George Washington",
+        birth_death="1732-1799",
+        term="1789-1797",
+        party="None",
+        election="1788",
+        vice_president="John Adams"
+    )
     database.insert_president(president)
     assert count_records_in_presidents() > 0
     database.reset_database()
@@ -212,17 +217,713 @@ def test_reset_database_when_table_does_not_exist():
     assert count_records_in_presidents() == 0
 
 def test_empty_database_after_reset():
-    president = {
-        "number": 1,
-        "picture": "image_url",
-        "name": "George Washington",
-        "birth_death": "1732-1799",
-        "term": "1789-1797",
-        "party": "None",
-        "election": "1788",
-        "vice_president": "John Adams"
-    }
+    president = President(
+        number=1,
+        picture="image_url",
+        name="George Washington",
+        birth_death="1732-1799",
+        term="1789-1797",
+        party="None",
+        election="1788",
+        vice_president="John Adams"
+    )
     database.insert_president(president)
     assert count_records_in_presidents() > 0
     database.reset_database()
     assert count_records_in_presidents() == 0
+
+def test_get_connection_reused_in_same_thread():
+    assert database.get_connection() is database.get_connection()
+
+def test_get_connection_differs_between_threads():
+    import threading
+    connections = []
+    thread = threading.Thread(
+        target=lambda: connections.append(database.get_connection()))
+    thread.start()
+    thread.join()
+    assert connections[0] is not database.get_connection()
+
+def test_get_connection_uses_wal_mode():
+    mode = database.get_connection().execute(
+        "PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+def test_get_connection_reopens_after_file_removed():
+    conn = database.get_connection()
+    os.remove(database.DATABASE_NAME)
+    database.create_table()
+    assert database.get_connection() is not conn
+    assert os.path.exists(database.DATABASE_NAME)
+
+def test_close_connections():
+    conn = database.get_connection()
+    database.close_connections()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert database.get_connection() is not conn
+
+def make_president(number, name, party="None"):
+    return President(
+        number=number,
+        picture="image_url",
+        name=name,
+        birth_death="N/A",
+        term="N/A",
+        party=party,
+        election="N/A",
+        vice_president="N/A"
+    )
+
+def test_bulk_upsert_presidents_inserts_from_generator():
+    presidents = (make_president(number, f"President {number}")
+                  for number in range(1, 6))
+    counts = database.bulk_upsert_presidents(presidents)
+    assert counts == {"inserted": 5, "updated": 0, "skipped": 0}
+    assert count_records_in_presidents() == 5
+
+def test_bulk_upsert_presidents_updates_and_skips():
+    database.bulk_upsert_presidents([make_president(1, "George Washington"),
+                                     make_president(2, "John Adams")])
+    counts = database.bulk_upsert_presidents([
+        make_president(1, "George Washington"),  # unchanged
+        make_president(2, "John Adams", party="Federalist"),  # changed
+        make_president(3, "Thomas Jefferson"),  # new
+        make_president(None, "No Number")  # no number
+    ])
+    assert counts == {"inserted": 1, "updated": 1, "skipped": 2}
+    conn = sqlite3.connect(database.DATABASE_NAME)
+    party = conn.execute(
+        "SELECT party FROM presidents WHERE number = 2").fetchone()[0]
+    conn.close()
+    assert party == "Federalist"
+    assert count_records_in_presidents() == 3
+
+def test_bulk_upsert_presidents_with_a_repeated_number():
+    first = make_president(1, "George Washington")._replace(
+        election="1788", vice_president="John Adams (1789 - 1797)")
+    counts = database.bulk_upsert_presidents([
+        first, first._replace(party="Federalist")])
+    assert counts == {"inserted": 1, "updated": 1, "skipped": 0}
+    conn = sqlite3.connect(database.DATABASE_NAME)
+    assert conn.execute("SELECT party FROM presidents").fetchall() == [
+        ("Federalist",)]
+    assert conn.execute("SELECT COUNT(*) FROM elections").fetchone() == (1,)
+    conn.close()
+
+def test_bulk_upsert_presidents_rolls_back_on_error():
+    def presidents():
+        yield make_president(1, "George Washington")
+        raise ValueError("scrape failed")
+    with pytest.raises(ValueError):
+        database.bulk_upsert_presidents(presidents())
+    assert count_records_in_presidents() == 0
+
+def test_connections_of_finished_threads_are_closed():
+    import threading
+    connections = []
+    thread = threading.Thread(
+        target=lambda: connections.append(database.get_connection()))
+    thread.start()
+    thread.join()
+    # opening another connection cleans up after the finished thread
+    other = threading.Thread(target=database.get_connection)
+    other.start()
+    other.join()
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+
+def test_store_and_fetch_cached_events():
+    database.store_events({1861: ["Event 1", "Event 2"], 1862: [],
+                           1863: None})
+    assert database.fetch_cached_events(1861, 1865, 60) == {
+        1861: ["Event 1", "Event 2"], 1862: [], 1863: None}
+    # expired failures are treated as never fetched
+    assert 1863 not in database.fetch_cached_events(1861, 1865, -1)
+
+def test_create_table_adds_term_columns_to_old_table():
+    database.close_connections()
+    os.remove(database.DATABASE_NAME)
+    conn = sqlite3.connect(database.DATABASE_NAME)
+    conn.execute("CREATE TABLE presidents (number INTEGER PRIMARY KEY, "
+                 "picture TEXT, name TEXT, birth_death TEXT, term TEXT, "
+                 "party TEXT, election TEXT, vice_president TEXT)")
+    conn.close()
+    database.create_table()
+    columns = [row[1] for row in database.get_connection().execute(
+        "PRAGMA table_info(presidents)")]
+    assert columns[-4:] == ["term_start", "term_end", "is_incumbent",
+                            "content_hash"]
+
+@pytest.mark.parametrize("term, expected", [
+    ("April 30, 1789 - March 4, 1797", ("1789-04-30", "1797-03-04", 0)),
+    ("January 20, 2025 - Incumbent", ("2025-01-20", None, 1)),
+    ("N/A", (None, None, 0)),
+    (None, (None, None, 0)),
+])
+def test_parse_term_columns(term, expected):
+    assert database.parse_term_columns(term) == expected
+
+def test_bulk_upsert_presidents_stores_parsed_term():
+    president = make_president(1, "George Washington")._replace(
+        term="April 30, 1789 - March 4, 1797")
+    database.bulk_upsert_presidents([president])
+    record = database.fetch_president_records()[0]
+    assert record.term_start == "1789-04-30"
+    assert record.term_end == "1797-03-04"
+    assert record.is_incumbent == 0
+
+def test_fetch_random_president_is_reproducible_with_seed():
+    database.bulk_upsert_presidents(
+        make_president(number, f"President {number}")
+        for number in range(1, 48))
+    first = [database.fetch_random_president(random.Random(7))
+             for _ in range(3)]
+    second = [database.fetch_random_president(random.Random(7))
+              for _ in range(3)]
+    assert first == second
+
+def test_fetch_random_president_skips_gaps():
+    database.bulk_upsert_presidents([make_president(1, "A"),
+                                     make_president(2, "B"),
+                                     make_president(4, "C")])
+    rng = random.Random(0)
+    names = {database.fetch_random_president(rng)["name"]
+             for _ in range(100)}
+    assert names == {"A", "B", "C"}
+
+def test_fetch_random_president_empty_table():
+    assert database.fetch_random_president() is None
+    assert database.fetch_wrong_presidents("Anyone") == []
+
+def test_fetch_wrong_presidents_distinct_names():
+    # two terms share a name, like Grover Cleveland
+    presidents = [make_president(number, f"President {number}")
+                  for number in range(1, 48)]
+    presidents[23] = presidents[23]._replace(name="President 22")
+    database.bulk_upsert_presidents(presidents)
+    rng = random.Random(3)
+    for _ in range(50):
+        wrong_names = database.fetch_wrong_presidents("President 1", rng=rng)
+        assert len(wrong_names) == len(set(wrong_names)) == 3
+        assert "President 1" not in wrong_names
+
+def test_random_sampling_work_does_not_grow_with_table():
+    statements = []
+    database.get_connection().set_trace_callback(statements.append)
+    for size in (50, 5000):
+        database.bulk_upsert_presidents(
+            make_president(number, f"President {number}")
+            for number in range(1, size + 1))
+        statements.clear()
+        database.fetch_random_president(random.Random(1))
+        database.fetch_wrong_presidents("President 1", rng=random.Random(1))
+        assert len(statements) <= 6
+        assert not any("RANDOM()" in statement for statement in statements)
+    database.get_connection().set_trace_callback(None)
+
+def test_fetch_question_single_query():
+    database.bulk_upsert_presidents(
+        make_president(number, f"President {number}")
+        for number in range(1, 48))
+    statements = []
+    database.get_connection().set_trace_callback(statements.append)
+    question = database.fetch_question(rng=random.Random(5))
+    database.get_connection().set_trace_callback(None)
+    assert len(statements) == 1
+    assert question["name"].startswith("President ")
+    assert question["picture"] == "image_url"
+    assert question["hint_column"] in database.HINT_COLUMNS
+    assert len(question["wrong_names"]) == len(set(
+        question["wrong_names"])) == 3
+    assert question["name"] not in question["wrong_names"]
+
+def test_fetch_question_choices_and_hint_columns():
+    database.bulk_upsert_presidents(
+        make_president(number, f"President {number}", party=f"Party {number}")
+        for number in range(1, 48))
+    rng = random.Random(2)
+    for _ in range(20):
+        question = database.fetch_question(
+            num_choices=6, hint_columns=["party"], rng=rng)
+        assert len(question["wrong_names"]) == 5
+        assert question["hint_column"] == "party"
+        assert question["hint"] == "Party " + question["name"].split()[-1]
+
+def test_fetch_question_small_table():
+    database.bulk_upsert_presidents([make_president(1, "A"),
+                                     make_president(2, "B"),
+                                     make_president(3, "A")])
+    question = database.fetch_question(rng=random.Random(0))
+    assert sorted([question["name"]] + question["wrong_names"]) == ["A", "B"]
+
+def test_fetch_question_empty_table():
+    assert database.fetch_question() is None
+
+def test_sync_presidents_inserts_updates_and_deletes():
+    database.sync_presidents([make_president(1, "George Washington"),
+                              make_president(2, "John Adams"),
+                              make_president(3, "Thomas Jefferson")])
+    counts = database.sync_presidents([
+        make_president("1", "George Washington"),  # unchanged
+        make_president(2, "John Adams", party="Federalist"),  # changed
+        make_president(4, "James Madison"),  # new
+        make_president(None, "No Number")  # no number
+    ])
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 1,
+                      "skipped": 2}
+    assert database.fetch_president_names() == [
+        "George Washington", "John Adams", "James Madison"]
+    assert database.sync_presidents([]) == {
+        "inserted": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    assert count_records_in_presidents() == 3
+
+def test_sync_presidents_only_writes_changed_rows():
+    presidents = [make_president(number, f"President {number}")
+                  for number in range(1, 6)]
+    database.sync_presidents(presidents)
+    conn = database.get_connection()
+    changes = conn.total_changes
+    counts = database.sync_presidents(presidents)
+    assert counts == {"inserted": 0, "updated": 0, "deleted": 0,
+                      "skipped": 5}
+    assert conn.total_changes == changes
+
+def test_sync_presidents_updates_rows_without_a_hash():
+    database.sync_presidents([make_president(1, "George Washington")])
+    database.get_connection().execute(
+        "UPDATE presidents SET content_hash = NULL")
+    counts = database.sync_presidents([make_president(1, "George Washington")])
+    assert counts["updated"] == 1
+
+def test_sync_presidents_readers_see_old_table_until_commit():
+    database.sync_presidents([make_president(number, f"President {number}")
+                              for number in range(1, 6)])
+    seen_by_reader = []
+
+    def presidents():
+        # a separate connection reads while the sync is half way through
+        yield make_president(1, "George Washington")
+        reader = sqlite3.connect(database.DATABASE_NAME)
+        seen_by_reader.append(reader.execute(
+            "SELECT COUNT(*), MIN(name) FROM presidents").fetchone())
+        reader.close()
+        yield make_president(6, "President 6")
+
+    database.sync_presidents(presidents())
+    assert seen_by_reader == [(5, "President 1")]
+    assert database.fetch_president_names() == ["George Washington",
+                                                "President 6"]
+
+def test_sync_presidents_rolls_back_on_error():
+    database.sync_presidents([make_president(1, "George Washington")])
+
+    def presidents():
+        yield make_president(2, "John Adams")
+        raise ValueError("scrape failed")
+    with pytest.raises(ValueError):
+        database.sync_presidents(presidents())
+    assert database.fetch_president_names() == ["George Washington"]
+
+def test_sync_presidents_can_keep_missing_rows():
+    database.sync_presidents([make_president(1, "George Washington"),
+                              make_president(2, "John Adams")])
+    counts = database.sync_presidents([make_president(1, "George Washington")],
+                                      delete_missing=lambda: False)
+    assert counts["deleted"] == 0
+    assert count_records_in_presidents() == 2
+
+def test_rebuild_presidents_swaps_in_new_table():
+    database.sync_presidents([make_president(1, "George Washington"),
+                              make_president(2, "John Adams"),
+                              make_president(3, "Thomas Jefferson")])
+    counts = database.rebuild_presidents([
+        make_president(1, "George Washington"),  # unchanged
+        make_president(2, "John Adams", party="Federalist"),  # changed
+        make_president(4, "James Madison"),  # new
+        make_president(4, "Duplicate"),  # first one wins
+        make_president(None, "No Number")  # no number
+    ])
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 1,
+                      "skipped": 3}
+    assert database.fetch_president_names() == [
+        "George Washington", "John Adams", "James Madison"]
+    conn = database.get_connection()
+    tables = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert database.PREVIOUS_TABLE in tables
+    assert database.SHADOW_TABLE not in tables
+
+def test_rebuild_presidents_keeps_table_when_nothing_scraped():
+    database.sync_presidents([make_president(1, "George Washington")])
+    counts = database.rebuild_presidents([])
+    assert not any(counts.values())
+    assert database.fetch_president_names() == ["George Washington"]
+    assert not database.rollback_presidents()
+
+def test_rebuild_presidents_can_keep_missing_rows():
+    database.sync_presidents([make_president(1, "George Washington"),
+                              make_president(2, "John Adams")])
+    counts = database.rebuild_presidents(
+        [make_president(1, "George Washington")], delete_missing=False)
+    assert counts["deleted"] == 0
+    assert database.fetch_president_names() == ["George Washington",
+                                                "John Adams"]
+
+def test_rollback_presidents():
+    database.sync_presidents([make_president(1, "George Washington")])
+    database.rebuild_presidents([make_president(1, "John Adams")])
+    assert database.rollback_presidents()
+    assert database.fetch_president_names() == ["George Washington"]
+    # rolling back again restores the rebuilt table
+    assert database.rollback_presidents()
+    assert database.fetch_president_names() == ["John Adams"]
+
+def test_rebuild_presidents_readers_keep_their_snapshot():
+    database.sync_presidents([make_president(1, "George Washington")])
+    reader = sqlite3.connect(database.DATABASE_NAME, isolation_level=None)
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT name FROM presidents").fetchall() == [
+        ("George Washington",)]
+    database.rebuild_presidents([make_president(1, "John Adams"),
+                                 make_president(2, "Thomas Jefferson")])
+    # a read transaction that started before the swap still sees the old
+    # table, and the next one sees the whole new table
+    assert reader.execute("SELECT name FROM presidents").fetchall() == [
+        ("George Washington",)]
+    reader.execute("COMMIT")
+    assert reader.execute(
+        "SELECT name FROM presidents ORDER BY number").fetchall() == [
+        ("John Adams",), ("Thomas Jefferson",)]
+    reader.close()
+
+def test_migrate_records_schema_version():
+    conn = database.get_connection()
+    assert database.get_schema_version() == len(database.MIGRATIONS)
+    versions = [row[0] for row in conn.execute(
+        "SELECT version FROM schema_version ORDER BY version")]
+    assert versions == list(range(1, len(database.MIGRATIONS) + 1))
+    # running it again applies nothing
+    assert database.migrate() == len(database.MIGRATIONS)
+    assert conn.execute(
+        "SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(versions)
+
+def test_migrate_old_database():
+    database.close_connections()
+    os.remove(database.DATABASE_NAME)
+    conn = sqlite3.connect(database.DATABASE_NAME)
+    conn.execute("CREATE TABLE presidents (number INTEGER PRIMARY KEY, "
+                 "picture TEXT, name TEXT, birth_death TEXT, term TEXT, "
+                 "party TEXT, election TEXT, vice_president TEXT)")
+    conn.close()
+    assert database.get_schema_version() == 0
+    database.create_table()
+    indexes = {row[0] for row in database.get_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(database.PRESIDENT_INDEXES) <= indexes
+    assert database.get_schema_version() == len(database.MIGRATIONS)
+
+def test_failed_migration_is_rolled_back(monkeypatch):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (x)")
+        raise sqlite3.OperationalError("migration failed")
+    version = database.get_schema_version()
+    monkeypatch.setattr(database, "MIGRATIONS",
+                        database.MIGRATIONS + (broken,))
+    with pytest.raises(sqlite3.OperationalError):
+        database.migrate()
+    conn = database.get_connection()
+    assert database.get_schema_version() == version
+    assert not conn.execute("SELECT 1 FROM sqlite_master "
+                            "WHERE name = 'half_done'").fetchone()
+
+def query_plans(function, *args):
+    # run function and return the plan of every query it executed
+    conn = database.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        function(*args)
+    finally:
+        conn.set_trace_callback(None)
+    return [" ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN " + statement)) for statement in statements]
+
+@pytest.mark.parametrize("function, args, index", [
+    # the name query fetch_wrong_presidents falls back to on small tables
+    (lambda: database._sample_other_names(
+        database.get_connection().cursor(), "John Adams", [], 2,
+        random.Random(0)), (), "presidents_name"),
+    # the Visuals party chart
+    (database.fetch_party_counts, (), "presidents_party"),
+    (database.fetch_vice_presidents_in_year, (1850,),
+     "vice_presidents_years"),
+    (database.fetch_era_names, (1850,), "elections_year"),
+])
+def test_hot_queries_use_an_index(function, args, index):
+    plans = query_plans(function, *args)
+    assert plans
+    for plan in plans:
+        assert f"INDEX {index}" in plan
+
+def test_indexes_follow_rebuild_and_rollback():
+    database.sync_presidents([make_president(1, "George Washington")])
+    database.rebuild_presidents([make_president(1, "John Adams")])
+    assert "presidents_party" in query_plans(
+        database.fetch_party_counts)[0]
+    database.rollback_presidents()
+    assert "presidents_party" in query_plans(
+        database.fetch_party_counts)[0]
+
+def test_party_counts():
+    presidents = [make_president(1, "George Washington"),
+                  make_president(2, "John Adams", party="Federalist"),
+                  make_president(3, "Thomas Jefferson",
+                                 party="Democratic-Republican")]
+    database.sync_presidents(presidents)
+    assert database.fetch_party_counts() == [
+        ("Democratic-Republican", 1), ("Federalist", 1), ("None", 1)]
+
+def details(number):
+    conn = database.get_connection()
+    vice_presidents = conn.execute(
+        "SELECT name, start_year, end_year FROM vice_presidents "
+        "WHERE president_number = ? ORDER BY rowid", (number,)).fetchall()
+    elections = [row[0] for row in conn.execute(
+        "SELECT year FROM elections WHERE president_number = ? "
+        "ORDER BY year", (number,))]
+    return vice_presidents, elections
+
+def roosevelt(vice_president="John Nance Garner 1933- 1941 "
+                             "Henry A. Wallace 1941- 1945"):
+    return make_president(32, "Franklin D. Roosevelt")._replace(
+        term="March 4, 1933 - April 12, 1945",
+        election="1932 1936 1940 1944", vice_president=vice_president)
+
+def test_sync_presidents_stores_vice_presidents_and_elections():
+    database.sync_presidents([roosevelt()])
+    assert details(32) == (
+        [("John Nance Garner", 1933, 1941), ("Henry A. Wallace", 1941, 1945)],
+        [1932, 1936, 1940, 1944])
+    database.sync_presidents([roosevelt("Harry S. Truman")])
+    assert details(32) == ([("Harry S. Truman", 1933, 1945)],
+                           [1932, 1936, 1940, 1944])
+    database.sync_presidents([make_president(1, "George Washington")])
+    assert details(32) == ([], [])
+
+def test_president_details_follow_every_write():
+    database.insert_president(roosevelt())
+    assert len(details(32)[1]) == 4
+    database.bulk_upsert_presidents([roosevelt("Harry S. Truman")])
+    assert details(32)[0] == [("Harry S. Truman", 1933, 1945)]
+    database.rebuild_presidents([roosevelt()])
+    assert len(details(32)[0]) == 2
+    database.rollback_presidents()
+    assert details(32)[0] == [("Harry S. Truman", 1933, 1945)]
+    database.reset_database()
+    assert details(32) == ([], [])
+
+def test_migration_fills_details_of_stored_presidents():
+    database.sync_presidents([roosevelt()])
+    conn = database.get_connection()
+    conn.execute("DROP TABLE vice_presidents")
+    conn.execute("DROP TABLE elections")
+    conn.execute("DELETE FROM schema_version WHERE version >= 2")
+    conn.commit()
+    database.migrate()
+    assert len(details(32)[0]) == 2
+
+def test_vice_president_and_era_queries():
+    adams = make_president(2, "John Adams")
+    adams = adams._replace(term="March 4, 1797 - March 4, 1801",
+                           election="1796", vice_president="Thomas Jefferson")
+    database.sync_presidents([adams, roosevelt(),
+                              make_president(33, "Harry S. Truman")])
+    assert database.fetch_vice_presidents_in_year(1941) == [
+        "John Nance Garner", "Henry A. Wallace"]
+    assert database.fetch_vice_presidents_in_year(1800) == [
+        "Thomas Jefferson"]
+    assert database.fetch_era_names(1940) == ["Franklin D. Roosevelt"]
+    assert database.fetch_era_names(
+        1940, exclude="Franklin D. Roosevelt") == []
+    assert database.fetch_era_names(1800, span=200) == [
+        "John Adams", "Franklin D. Roosevelt"]
+
+@pytest.fixture
+def snapshot_mode():
+    database.use_snapshot()
+    yield
+    database.use_snapshot(False)
+
+def test_read_connection_without_snapshot():
+    assert database.get_read_connection() is database.get_connection()
+
+def test_snapshot_serves_reads_from_memory(snapshot_mode):
+    database.sync_presidents([make_president(1, "George Washington")])
+    conn = database.get_read_connection()
+    assert conn is not database.get_connection()
+    assert conn.execute("PRAGMA database_list").fetchone()[2] == ""
+    assert database.fetch_president_names() == ["George Washington"]
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM presidents")  # snapshots are read only
+
+def test_snapshot_reloads_after_writes_in_this_process(snapshot_mode):
+    database.sync_presidents([make_president(1, "George Washington")])
+    assert database.fetch_president_names() == ["George Washington"]
+    database.sync_presidents([make_president(1, "George Washington"),
+                              make_president(2, "John Adams")])
+    assert database.fetch_president_names() == ["George Washington",
+                                                "John Adams"]
+
+def test_snapshot_reloads_when_refresh_stamp_changes(snapshot_mode,
+                                                     monkeypatch):
+    database.sync_presidents([make_president(1, "George Washington")])
+    database.set_metadata({"refreshed_at": 1})
+    assert database.fetch_president_names() == ["George Washington"]
+    # another process writes the file: nothing changes until the stamp
+    # on disk does
+    monkeypatch.setattr(database, "SNAPSHOT_CHECK_INTERVAL", 0)
+    other = sqlite3.connect(database.DATABASE_NAME)
+    with other:
+        other.execute("UPDATE presidents SET name = 'John Adams'")
+    assert database.fetch_president_names() == ["George Washington"]
+    with other:
+        other.execute("UPDATE metadata SET value = '2' "
+                      "WHERE key = 'refreshed_at'")
+    other.close()
+    assert database.fetch_president_names() == ["John Adams"]
+
+def test_snapshot_reloads_when_another_process_stores_portraits(
+        snapshot_mode, monkeypatch):
+    database.sync_presidents([make_president(1, "George Washington")])
+    assert database.fetch_portrait(1) is None
+    monkeypatch.setattr(database, "SNAPSHOT_CHECK_INTERVAL", 0)
+    database.store_portraits([{"number": 1, "url": "url",
+                               "content_hash": "hash",
+                               "content_type": "image/png", "data": b"png"}])
+    # as if the portrait came from another process (e.g. refresh.py
+    # --prefetch-images), which doesn't mark this process's snapshot
+    monkeypatch.setattr(database, "_snapshot_dirty", False)
+    assert database.fetch_portrait(1) == b"png"
+
+def test_snapshot_concurrent_reads(snapshot_mode):
+    import threading
+    database.sync_presidents(make_president(number, f"President {number}")
+                             for number in range(1, 48))
+    questions, errors = [], []
+
+    def ask():
+        try:
+            for _ in range(20):
+                questions.append(database.fetch_question())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(questions) == 160
+    assert all(len(question["wrong_names"]) == 3 for question in questions)
+
+def hints(number):
+    return dict(database.get_connection().execute(
+        "SELECT kind, text FROM hints WHERE president_number = ?",
+        (number,)).fetchall())
+
+def test_hints_leave_out_empty_and_repeated_hints():
+    truman = make_president(33, "Harry S. Truman", party="Democratic")
+    truman = truman._replace(birth_death="1884 - 1972", term="1945 - 1953",
+                             election="1948", vice_president="1948")
+    database.sync_presidents([truman, make_president(34, "Nobody")])
+    assert hints(33) == {"birth_death": "1884 - 1972", "term": "1945 - 1953",
+                         "party": "Democratic", "election": "1948"}
+    assert hints(34) == {"party": "None"}
+    database.sync_presidents([make_president(34, "Nobody")])
+    assert hints(33) == {}
+
+def test_hints_leave_out_footnote_only_texts():
+    tyler = make_president(10, "John Tyler", party="Whig[f]")
+    tyler = tyler._replace(election="[g]", vice_president="- [h]")
+    database.sync_presidents([tyler])
+    assert hints(10) == {"party": "Whig"}
+
+def test_hint_quality_counts_presidents_sharing_a_hint():
+    presidents = [make_president(number, f"President {number}",
+                                 party="Whig" if number < 4 else "Federalist")
+                  for number in range(1, 6)]
+    # a second term counts once
+    presidents[2] = presidents[2]._replace(name="President 1")
+    database.sync_presidents(presidents)
+    quality = dict(database.get_connection().execute(
+        "SELECT president_number, quality FROM hints WHERE kind = 'party'"))
+    assert quality == {1: 0.5, 2: 0.5, 3: 0.5, 4: 0.5, 5: 0.5}
+    database.sync_presidents(presidents[:4])
+    assert database.get_connection().execute(
+        "SELECT quality FROM hints WHERE president_number = 4").fetchone() \
+        == (1.0,)
+
+def test_fetch_question_difficulty_weights_hints():
+    # one president with a party of their own, nine sharing one
+    database.sync_presidents(
+        [make_president(1, "Loner", party="Solo")]
+        + [make_president(number, f"President {number}", party="Crowd")
+           for number in range(2, 11)])
+    rng = random.Random(4)
+
+    def loner_share(difficulty):
+        names = [database.fetch_question(hint_columns=["party"], rng=rng,
+                                         difficulty=difficulty)["name"]
+                 for _ in range(400)]
+        return names.count("Loner") / len(names)
+
+    # weights 1 vs 1/9 each, 1 each, and 1 vs 9 each
+    assert loner_share("easy") > 0.4
+    assert 0.04 < loner_share("medium") < 0.2
+    assert loner_share("hard") < 0.05
+
+def test_fetch_question_never_gives_empty_hints():
+    presidents = [make_president(number, f"President {number}")
+                  for number in range(1, 21)]
+    for index, president in enumerate(presidents[::2]):
+        presidents[2 * index] = president._replace(
+            election=f"{1788 + 4 * president.number}")
+    database.sync_presidents(presidents)
+    rng = random.Random(6)
+    for _ in range(50):
+        question = database.fetch_question(hint_columns=["Election Date"],
+                                           rng=rng)
+        assert question["number"] % 2 == 1
+        assert question["hint"] == str(1788 + 4 * question["number"])
+    # with no hint of the kind at all the question has no hint
+    question = database.fetch_question(hint_columns=["Birth/Death"], rng=rng)
+    assert question["hint"] is None
+    assert len(question["wrong_names"]) == 3
+
+def test_hint_picks_use_the_difficulty_index():
+    database.sync_presidents([make_president(1, "George Washington")])
+    plans = query_plans(database.fetch_question, 4, ["party"],
+                        random.Random(0), "hard")
+    assert "USING INDEX hints_hard" in plans[0] \
+        or "USING COVERING INDEX hints_hard" in plans[0]
+
+def test_migration_fills_hints_of_stored_presidents():
+    database.sync_presidents([roosevelt()])
+    conn = database.get_connection()
+    conn.execute("DROP TABLE hints")
+    conn.execute("DELETE FROM schema_version WHERE version >= 3")
+    conn.commit()
+    database.migrate()
+    assert hints(32)["election"] == "1932 1936 1940 1944"
+
+def test_vacancy_is_not_credited_to_the_vice_president_before_it():
+    cleveland = make_president(22, "Grover Cleveland")
+    cleveland = cleveland._replace(
+        term="March 4, 1885 - March 4, 1889",
+        vice_president="Thomas A. Hendricks Office vacant 1885- 1889")
+    database.sync_presidents([cleveland])
+    assert database.fetch_vice_presidents_in_year(1885) == [
+        "Thomas A. Hendricks"]
+    assert database.fetch_vice_presidents_in_year(1887) == []
@@ -0,0 +1,67 @@
+import pytest
+import database
+import dataset
+import pandas as pd
+from models import President
+
+
+def president(number, name, term=None):
+    # a president with only the fields these tests read
+    return President(number, None, name, None, term, None, None, None)
+
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME",
+                        str(tmp_path / "presidents.db"))
+    dataset.clear_cache()
+    database.create_table()
+    database.bulk_upsert_presidents([
+        president(22, "Grover Cleveland", "1885 - 1889"),
+        president(23, "Benjamin Harrison", "1889 - 1893"),
+        president(24, "Grover Cleveland", "1893 - 1897"),
+    ])
+    database.set_metadata({"refreshed_at": 1})
+    yield
+    dataset.clear_cache()
+    database.close_connections()
+
+def test_get_presidents_ordered_by_number():
+    names = [record.name for record in dataset.get_presidents()]
+    assert names == ["Grover Cleveland", "Benjamin Harrison",
+                     "Grover Cleveland"]
+
+def test_find_by_name_returns_every_term():
+    terms = [record.term
+             for record in dataset.find_by_name("Grover Cleveland")]
+    assert terms == ["1885 - 1889", "1893 - 1897"]
+    assert dataset.find_by_name("Nobody") == []
+
+def test_find_by_number():
+    assert dataset.find_by_number("23").name == "Benjamin Harrison"
+    assert dataset.find_by_number(1) is None
+
+def test_dataset_is_loaded_once(monkeypatch):
+    first = dataset.get_dataset()
+    monkeypatch.setattr(database, "fetch_president_records",
+                        lambda: pytest.fail("dataset was reloaded"))
+    assert dataset.get_dataset() is first
+
+def test_dataset_reloads_after_refresh():
+    dataset.get_dataset()
+    database.bulk_upsert_presidents([president(25, "William McKinley")])
+    assert dataset.find_by_number(25) is None
+    database.set_metadata({"refreshed_at": 2})
+    assert dataset.find_by_number(25).name == "William McKinley"
+
+def test_presidents_dataframe_is_a_copy():
+    df = dataset.presidents_dataframe()
+    assert isinstance(df, pd.DataFrame)
+    assert list(df.columns) == list(database.PRESIDENT_COLUMNS)
+    df["name"] = "changed"
+    assert dataset.get_presidents()[0].name == "Grover Cleveland"
+
+def test_empty_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME",
+                        str(tmp_path / "empty.db"))
+    assert dataset.get_presidents() == []
@@ -0,0 +1,122 @@
+import pytest
+import threading
+import http_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # serves the server's body with an ETag and Last-Modified header and
+    # answers conditional requests with 304 Not Modified
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = f'"{server.version}"'
+        if (self.headers.get("If-None-Match") == etag
+                or self.headers.get("If-Modified-Since")
+                == server.last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = server.body.encode()
+        self.send_response(200)
+        if server.send_etag:
+            self.send_header("ETag", etag)
+        self.send_header("Last-Modified", server.last_modified)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # keep test output quiet
+
+
+@pytest.fixture
+def stub_server():
+    server = HTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.body = "<table>v1</table>"
+    server.version = 1
+    server.send_etag = True
+    server.last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/presidents"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return http_cache.FileCache(str(tmp_path))
+
+
+def test_file_cache_round_trip(cache):
+    assert cache.get("http://example.com") is None
+    cache.set("http://example.com", {"body": "hi", "fetched_at": 1})
+    assert cache.get("http://example.com") == {"body": "hi", "fetched_at": 1}
+
+
+def test_cached_get_serves_from_disk_within_ttl(stub_server, cache):
+    first = http_cache.cached_get(stub_server.url, cache, ttl=60)
+    second = http_cache.cached_get(stub_server.url, cache, ttl=60)
+    assert first.text == second.text == "<table>v1</table>"
+    assert second.from_cache
+    assert len(stub_server.requests) == 1
+
+
+def test_cached_get_revalidates_with_etag(stub_server, cache):
+    http_cache.cached_get(stub_server.url, cache, ttl=0)
+    response = http_cache.cached_get(stub_server.url, cache, ttl=0)
+    assert response.status_code == 200
+    assert response.text == "<table>v1</table>"
+    assert response.from_cache
+    assert stub_server.requests[1]["If-None-Match"] == '"1"'
+
+
+def test_cached_get_revalidates_with_last_modified(stub_server, cache):
+    stub_server.send_etag = False
+    http_cache.cached_get(stub_server.url, cache, ttl=0)
+    response = http_cache.cached_get(stub_server.url, cache, ttl=0)
+    assert response.from_cache
+    assert "If-None-Match" not in stub_server.requests[1]
+    assert (stub_server.requests[1]["If-Modified-Since"]
+            == stub_server.last_modified)
+
+
+def test_cached_get_replaces_changed_content(stub_server, cache):
+    http_cache.cached_get(stub_server.url, cache, ttl=0)
+    stub_server.body = "<table>v2</table>"
+    stub_server.version = 2
+    stub_server.last_modified = "Tue, 02 Jan 2024 00:00:00 GMT"
+    response = http_cache.cached_get(stub_server.url, cache, ttl=0)
+    assert response.text == "<table>v2</table>"
+    assert cache.get(stub_server.url)["etag"] == '"2"'
+
+
+def test_cached_get_falls_back_to_stale_copy(stub_server, cache):
+    http_cache.cached_get(stub_server.url, cache, ttl=0)
+    url = stub_server.url
+    stub_server.shutdown()
+    stub_server.server_close()
+    response = http_cache.cached_get(url, cache, ttl=0)
+    assert response.text == "<table>v1</table>"
+
+
+def test_cached_get_without_cache(stub_server):
+    response = http_cache.cached_get(stub_server.url)
+    assert response.text == "<table>v1</table>"
+    assert not hasattr(response, "from_cache")
+
+
+def test_cached_get_times_out(stub_server, cache, monkeypatch):
+    calls = []
+    real_get = http_cache.requests.get
+
+    def get(url, **kwargs):
+        calls.append(kwargs["timeout"])
+        return real_get(url, **kwargs)
+    monkeypatch.setattr(http_cache.requests, "get", get)
+    http_cache.cached_get(stub_server.url)
+    http_cache.cached_get(stub_server.url, cache)
+    assert calls == [http_cache.REQUEST_TIMEOUT] * 2
@@ -0,0 +1,180 @@
+import hashlib
+import io
+import pytest
+import requests
+import database
+import images
+from models import President
+from PIL import Image
+from unittest.mock import MagicMock, patch
+
+
+def president(number, name, picture):
+    # a president with only the fields these tests read
+    return President(number, picture, name, None, None, None, None, None)
+
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME",
+                        str(tmp_path / "presidents.db"))
+    database.create_table()
+    database.bulk_upsert_presidents([
+        president(1, "George Washington",
+                  "https://upload.wikimedia.org/washington.jpg"),
+        president(2, "John Adams", "https://upload.wikimedia.org/adams.jpg"),
+    ])
+    yield
+    database.close_connections()
+
+
+def image_response(url, **kwargs):
+    # a fake download whose bytes depend on the url
+    response = MagicMock()
+    response.content = f"image of {url}".encode()
+    response.headers = {"Content-Type": "image/jpeg"}
+    return response
+
+
+@patch("images.requests.get", side_effect=image_response)
+def test_prefetch_portraits_downloads_each_once(mock_get):
+    assert images.prefetch_portraits() == {"downloaded": 2, "failed": 0}
+    assert images.prefetch_portraits() == {"downloaded": 0, "failed": 0}
+    assert mock_get.call_count == 2
+    assert mock_get.call_args.kwargs["headers"]["User-Agent"] == \
+        images.USER_AGENT
+    data = database.fetch_portrait(1)
+    assert data == b"image of https://upload.wikimedia.org/washington.jpg"
+    row = database.get_connection().execute(
+        "SELECT content_hash, content_type FROM portraits WHERE number = 1"
+    ).fetchone()
+    assert row == (hashlib.sha256(data).hexdigest(), "image/jpeg")
+
+
+@patch("images.requests.get", side_effect=image_response)
+def test_prefetch_portraits_refetches_changed_url(mock_get):
+    images.prefetch_portraits()
+    database.bulk_upsert_presidents([
+        president(2, "John Adams",
+                  "https://upload.wikimedia.org/adams2.jpg")])
+    assert images.prefetch_portraits() == {"downloaded": 1, "failed": 0}
+    assert database.fetch_portrait(2) == \
+        b"image of https://upload.wikimedia.org/adams2.jpg"
+
+
+@patch("images.requests.get")
+def test_prefetch_portraits_counts_failures(mock_get):
+    mock_get.side_effect = requests.exceptions.ConnectionError("offline")
+    assert images.prefetch_portraits() == {"downloaded": 0, "failed": 2}
+    assert database.fetch_portrait(1) is None
+
+
+@patch("images.requests.get", side_effect=image_response)
+def test_portrait_source_prefers_local_copy(mock_get):
+    url = "https://upload.wikimedia.org/washington.jpg"
+    assert images.portrait_source(1, url) == url
+    images.prefetch_portraits()
+    assert images.portrait_source(1, url) == f"image of {url}".encode()
+    assert images.portrait_source(None, url) == url
+
+
+def test_portrait_source_without_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME", str(tmp_path / "new.db"))
+    assert images.portrait_source(1, "url") == "url"
+
+
+def png_bytes(width, height):
+    # a real image of the given size, with some transparency
+    output = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(output, "PNG")
+    return output.getvalue()
+
+
+def variant_size(data):
+    return Image.open(io.BytesIO(data)).size
+
+
+def test_make_variants_resizes_without_enlarging():
+    variants = images.make_variants(1, png_bytes(200, 400))
+    sizes = {(v["width"], v["format"]): variant_size(v["data"])
+             for v in variants}
+    # too narrow for 300px, so the widest copy keeps its own 200px
+    assert sizes == {(150, "WEBP"): (150, 300), (150, "JPEG"): (150, 300),
+                     (200, "WEBP"): (200, 400), (200, "JPEG"): (200, 400)}
+    assert {v["content_type"] for v in variants} == {"image/webp",
+                                                     "image/jpeg"}
+
+
+def test_make_variants_of_a_thumbnail_are_made_once():
+    variants = images.make_variants(1, png_bytes(80, 100))
+    assert [(v["width"], v["format"]) for v in variants] == [
+        (80, "WEBP"), (80, "JPEG")]
+
+
+def test_make_variants_unreadable_image():
+    assert images.make_variants(1, b"not an image") == []
+
+
+@patch("images.requests.get")
+def test_prefetch_portraits_builds_variants(mock_get):
+    mock_get.return_value.content = png_bytes(600, 800)
+    mock_get.return_value.headers = {"Content-Type": "image/png"}
+    images.prefetch_portraits()
+    data = images.portrait_source(1, "url")
+    assert variant_size(data) == (300, 400)
+    assert len(data) < len(database.fetch_portrait(1))
+    assert variant_size(images.portrait_source(1, "url", width=100)) == \
+        (150, 200)
+    # nothing is wider than 300px, so that is the best for wider displays
+    assert variant_size(images.portrait_source(1, "url", width=500)) == \
+        (300, 400)
+
+
+def test_source_url_asks_for_a_wider_thumbnail():
+    thumbnail = ("https://upload.wikimedia.org/wikipedia/commons/thumb/b/b6/"
+                 "Gilbert_Stuart.jpg/80px-Gilbert_Stuart.jpg")
+    assert images.source_url(thumbnail) == thumbnail.replace("/80px-",
+                                                             "/300px-")
+    assert images.source_url("https://example.com/a.jpg") == \
+        "https://example.com/a.jpg"
+
+
+@patch("images.requests.get")
+def test_download_portrait_falls_back_to_scraped_thumbnail(mock_get):
+    url = "https://upload.wikimedia.org/thumb/a.jpg/80px-a.jpg"
+    mock_get.side_effect = [requests.exceptions.HTTPError("400"),
+                            image_response(url)]
+    portrait = images.download_portrait(1, url)
+    assert portrait["url"] == url
+    assert portrait["data"] == f"image of {url}".encode()
+    assert [call.args[0] for call in mock_get.call_args_list] == [
+        url.replace("/80px-", "/300px-"), url]
+
+
+def test_variant_served_is_the_smallest_adequate_one():
+    database.store_portrait_variants([
+        {"number": 1, "width": 300, "format": "WEBP",
+         "content_type": "image/webp", "data": b"small"},
+        {"number": 1, "width": 300, "format": "JPEG",
+         "content_type": "image/jpeg", "data": b"much larger"},
+        {"number": 1, "width": 150, "format": "WEBP",
+         "content_type": "image/webp", "data": b"tiny"},
+    ])
+    assert database.fetch_portrait_variant(1, 300) == b"small"
+    assert database.fetch_portrait_variant(1, 150) == b"tiny"
+    assert database.fetch_portrait_variant(2, 300) is None
+
+
+def test_build_missing_variants_for_stored_portraits():
+    database.store_portraits([{"number": 1, "url": "url",
+                               "content_hash": "hash",
+                               "content_type": "image/png",
+                               "data": png_bytes(400, 400)}])
+    assert images.build_missing_variants() == 1
+    assert images.build_missing_variants() == 0
+    # replacing the portrait drops its old variants
+    database.store_portraits([{"number": 1, "url": "url2",
+                               "content_hash": "hash2",
+                               "content_type": "image/png",
+                               "data": png_bytes(100, 100)}])
+    assert database.fetch_portrait_variant(1, 300) is None
@@ -0,0 +1,30 @@
+import json
+import pandas as pd
+import pytest
+from models import President
+
+LINCOLN = President(16, "image_url", "Abraham Lincoln", "1809 - 1865",
+                    "1861 - 1865", "Republican", "1860 1864",
+                    "Hannibal Hamlin")
+
+def test_fields_read_by_attribute():
+    assert LINCOLN.name == "Abraham Lincoln"
+    assert LINCOLN.party == "Republican"
+    assert LINCOLN[0] == 16
+    assert LINCOLN.term_start is None
+    assert LINCOLN.is_incumbent == 0
+
+def test_converts_to_dict_and_json():
+    record = LINCOLN._asdict()
+    assert record["vice_president"] == "Hannibal Hamlin"
+    assert list(record) == list(President._fields)
+    assert json.loads(json.dumps(LINCOLN))[2] == "Abraham Lincoln"
+
+def test_has_no_instance_dict():
+    with pytest.raises(AttributeError):
+        LINCOLN.__dict__
+
+def test_records_become_a_dataframe():
+    df = pd.DataFrame.from_records([LINCOLN], columns=President._fields)
+    assert list(df.columns) == list(President._fields)
+    assert df.loc[0, "name"] == "Abraham Lincoln"
@@ -0,0 +1,153 @@
+import itertools
+import random
+import threading
+import pytest
+import questions
+from unittest.mock import patch
+
+
+@pytest.fixture(autouse=True)
+def refreshed_at():
+    # the refresh stamp the pool tags questions with, set by each test
+    with patch("questions.database.get_refreshed_at",
+               return_value=1.0) as mock_refreshed_at:
+        yield mock_refreshed_at
+
+
+def counting_build():
+    # builds numbered questions so tests can tell them apart
+    counter = itertools.count()
+    return lambda: {"name": f"President {next(counter)}"}
+
+
+@patch("questions.database.fetch_question")
+def test_build_question(mock_fetch_question):
+    mock_fetch_question.return_value = {
+        "number": 1, "name": "George Washington", "picture": "http://image.jpg",
+        "hint": "1789 - 1797", "hint_column": "term",
+        "wrong_names": ["John Adams", "Thomas Jefferson"]}
+    question = questions.build_question()
+    assert question["name"] == "George Washington"
+    assert sorted(question["choices"]) == ["George Washington", "John Adams",
+                                           "Thomas Jefferson"]
+    assert question["hint"] == "1789 - 1797"
+    mock_fetch_question.assert_called_once_with(questions.NUM_CHOICES)
+
+
+@patch("questions.database.fetch_question", return_value=None)
+def test_build_question_without_presidents(mock_fetch_question):
+    assert questions.build_question() is None
+
+
+def test_fill_and_get_in_order():
+    pool = questions.QuestionPool(size=5, low_watermark=0,
+                                  build=counting_build())
+    pool.fill()
+    assert len(pool) == 5
+    assert [pool.get()["name"] for _ in range(2)] == ["President 0",
+                                                      "President 1"]
+    assert len(pool) == 3
+
+
+def test_get_from_empty_pool_builds_inline():
+    pool = questions.QuestionPool(size=4, low_watermark=2,
+                                  build=counting_build())
+    assert pool.get() == {"name": "President 0"}
+    # taking a question below the watermark refilled the pool
+    pool.refill_in_background().join()
+    assert len(pool) == 4
+
+
+def test_refill_starts_below_watermark():
+    pool = questions.QuestionPool(size=6, low_watermark=3,
+                                  build=counting_build())
+    pool.fill()
+    with patch.object(pool, "refill_in_background") as mock_refill:
+        for _ in range(3):
+            pool.get()
+        mock_refill.assert_not_called()
+        pool.get()
+        mock_refill.assert_called_once()
+
+
+def test_only_one_refill_thread_at_a_time():
+    release = threading.Event()
+    build = counting_build()
+
+    def slow_build():
+        release.wait(5)
+        return build()
+    pool = questions.QuestionPool(size=3, build=slow_build)
+    first = pool.refill_in_background()
+    assert pool.refill_in_background() is first
+    release.set()
+    first.join()
+    assert len(pool) == 3
+
+
+def test_fill_stops_when_nothing_to_build():
+    pool = questions.QuestionPool(size=3, build=lambda: None)
+    pool.fill()
+    assert len(pool) == 0
+    assert pool.get() is None
+
+
+def test_clear():
+    pool = questions.QuestionPool(size=3, build=counting_build())
+    pool.fill()
+    pool.clear()
+    assert len(pool) == 0
+
+
+def test_questions_from_before_a_refresh_are_dropped(refreshed_at,
+                                                     monkeypatch):
+    pool = questions.QuestionPool(size=3, low_watermark=0,
+                                  build=counting_build())
+    pool.fill()
+    # another process refreshed the data, without clearing this pool
+    refreshed_at.return_value = 2.0
+    monkeypatch.setattr(questions, "STAMP_CHECK_INTERVAL", 0)
+    assert pool.get() == {"name": "President 3"}
+    assert len(pool) == 0
+
+
+def test_refill_running_during_a_refresh_tags_with_old_stamp(refreshed_at,
+                                                             monkeypatch):
+    monkeypatch.setattr(questions, "STAMP_CHECK_INTERVAL", 0)
+    build = counting_build()
+
+    def build_during_refresh():
+        question = build()
+        refreshed_at.return_value = 2.0  # the refresh lands mid-build
+        return question
+    pool = questions.QuestionPool(size=1, low_watermark=0,
+                                  build=build_during_refresh)
+    pool.fill()
+    pool.build = build
+    assert pool.get() == {"name": "President 1"}
+
+
+def test_stamp_is_only_read_every_check_interval(refreshed_at):
+    pool = questions.QuestionPool(size=4, low_watermark=0,
+                                  build=counting_build())
+    pool.fill()
+    refreshed_at.reset_mock()
+    for _ in range(3):
+        pool.get()
+    refreshed_at.assert_not_called()
+    # clearing the pool makes the next question read the stamp again
+    pool.clear()
+    pool.get()
+    refreshed_at.assert_called_once_with()
+
+
+@patch("questions.database.fetch_question")
+def test_build_question_shuffles_with_the_database_rng(mock_fetch_question,
+                                                       monkeypatch):
+    mock_fetch_question.return_value = {
+        "number": 1, "name": "A", "picture": "", "hint": "",
+        "hint_column": "term", "wrong_names": ["B", "C", "D"]}
+    monkeypatch.setattr(questions.database, "RNG", random.Random(0))
+    first = questions.build_question()["choices"]
+    monkeypatch.setattr(questions.database, "RNG", random.Random(0))
+    assert questions.build_question()["choices"] == first
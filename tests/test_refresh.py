@@ -0,0 +1,212 @@
+import pytest
+import time
+import database
+import refresh
+import requests
+import scraper
+from models import President
+from unittest.mock import patch
+
+PRESIDENTS = [
+    President(number=1, picture="image_url", name="George Washington",
+              birth_death="1732 - 1799", term="1789 - 1797", party="None",
+              election="1788 1792", vice_president="John Adams"),
+    President(number=2, picture="image_url", name="John Adams",
+              birth_death="1735 - 1826", term="1797 - 1801",
+              party="Federalist", election="1796",
+              vice_president="Thomas Jefferson"),
+]
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME",
+                        str(tmp_path / "presidents.db"))
+    yield
+    database.close_connections()
+
+@pytest.fixture(autouse=True)
+def mock_prefetch_portraits():
+    with patch("refresh.images.prefetch_portraits") as mock_prefetch:
+        mock_prefetch.return_value = {"downloaded": 0, "failed": 0}
+        yield mock_prefetch
+
+def test_is_stale_when_never_refreshed():
+    assert refresh.is_stale()
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_records_timestamp_and_hash(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    summary = refresh.refresh_database()
+    assert summary == {"inserted": 2, "updated": 0, "deleted": 0,
+                       "skipped": 0, "changed": True, "errors": 0}
+    assert database.fetch_president_names() == ["George Washington",
+                                                "John Adams"]
+    assert database.get_refreshed_at() == pytest.approx(time.time(), abs=5)
+    assert len(database.get_metadata("source_hash")) == 64
+    assert not refresh.is_stale()
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_same_content_is_unchanged(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    summary = refresh.refresh_database()
+    assert summary == {"inserted": 0, "updated": 0, "deleted": 0,
+                       "skipped": 2, "changed": False, "errors": 0}
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_keeps_data_when_scrape_fails(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    refreshed_at = database.get_refreshed_at()
+    mock_scrape.return_value = []
+    assert refresh.refresh_database() is None
+    assert database.get_refreshed_at() == refreshed_at
+    assert len(database.fetch_president_names()) == 2
+
+@patch("refresh.iter_presidents")
+def test_ensure_fresh_only_scrapes_when_stale(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    assert refresh.ensure_fresh() is not None
+    assert refresh.ensure_fresh() is None
+    mock_scrape.assert_called_once()
+    # with a zero ttl the data is always stale
+    assert refresh.ensure_fresh(ttl=0) is not None
+    assert mock_scrape.call_count == 2
+
+@patch("refresh.iter_presidents")
+def test_main_force(mock_scrape, capsys):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.main([])
+    refresh.main(["--force"])
+    assert mock_scrape.call_count == 2
+    mock_scrape.assert_called_with(ttl=0)
+    assert "2 unchanged" in capsys.readouterr().out
+
+@patch("refresh.iter_presidents")
+def test_main_when_fresh(mock_scrape, capsys):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    refresh.main([])
+    assert "nothing to do" in capsys.readouterr().out
+
+@patch("refresh.api.prefetch_events")
+@patch("refresh.iter_presidents")
+def test_main_prefetch_events(mock_scrape, mock_prefetch, capsys):
+    mock_scrape.return_value = PRESIDENTS
+    mock_prefetch.return_value = {1789: [], 1790: []}
+    refresh.main(["--prefetch-events"])
+    mock_prefetch.assert_called_once_with()
+    assert "Cached events for 2 years." in capsys.readouterr().out
+
+@patch("refresh.iter_presidents")
+def test_is_stale_after_ingest_version_change(mock_scrape, monkeypatch):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    assert not refresh.is_stale()
+    monkeypatch.setattr(refresh, "INGEST_VERSION", refresh.INGEST_VERSION + 1)
+    assert refresh.is_stale()
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_downloads_portraits(mock_scrape,
+                                              mock_prefetch_portraits):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    mock_prefetch_portraits.assert_called_once_with()
+
+@patch("refresh.iter_presidents")
+def test_main_prefetch_images(mock_scrape, mock_prefetch_portraits, capsys):
+    mock_scrape.return_value = PRESIDENTS
+    mock_prefetch_portraits.return_value = {"downloaded": 2, "failed": 1}
+    refresh.main(["--prefetch-images"])
+    assert "Downloaded 2 portraits, 1 failed." in capsys.readouterr().out
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_reports_row_errors(mock_scrape, capsys):
+    mock_scrape.return_value = [PRESIDENTS[0],
+                                {"error": "TypeError: bad row", "row": 2},
+                                PRESIDENTS[1]]
+    summary = refresh.refresh_database()
+    assert summary["inserted"] == 2
+    assert summary["errors"] == 1
+    assert "error: TypeError: bad row" in capsys.readouterr().out
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_without_table(mock_scrape, capsys):
+    mock_scrape.return_value = [
+        {"error": "Could not find the presidents table.", "row": None}]
+    assert refresh.refresh_database() is None
+    assert "Could not find" in capsys.readouterr().out
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_deletes_presidents_that_are_gone(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    mock_scrape.return_value = PRESIDENTS[:1]
+    summary = refresh.refresh_database()
+    assert summary["deleted"] == 1
+    assert database.fetch_president_names() == ["George Washington"]
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_keeps_rows_that_failed_to_parse(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    mock_scrape.return_value = [PRESIDENTS[0],
+                                {"error": "TypeError: bad row", "row": 2}]
+    summary = refresh.refresh_database()
+    assert summary["deleted"] == 0
+    assert len(database.fetch_president_names()) == 2
+
+@patch("refresh.iter_presidents")
+def test_refresh_database_rebuild_and_rollback(mock_scrape):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.refresh_database()
+    first_hash = database.get_metadata("source_hash")
+    mock_scrape.return_value = PRESIDENTS[:1]
+    summary = refresh.refresh_database(rebuild=True)
+    assert summary["deleted"] == 1
+    assert database.fetch_president_names() == ["George Washington"]
+    refreshed_at = database.get_refreshed_at()
+
+    assert refresh.rollback()
+    assert database.fetch_president_names() == ["George Washington",
+                                                "John Adams"]
+    assert database.get_metadata("source_hash") == first_hash
+    assert database.get_refreshed_at() >= refreshed_at
+
+@patch("refresh.iter_presidents")
+def test_main_rebuild_and_rollback(mock_scrape, capsys):
+    mock_scrape.return_value = PRESIDENTS
+    refresh.main(["--rollback"])
+    assert "Nothing to roll back to." in capsys.readouterr().out
+    refresh.main(["--rebuild"])
+    mock_scrape.assert_called_with(ttl=0)
+    assert "2 inserted" in capsys.readouterr().out
+    refresh.main(["--rollback"])
+    assert "Rolled back" in capsys.readouterr().out
+    assert database.fetch_president_names() == []
+
+@patch("scraper.http_cache.requests.get")
+def test_ensure_fresh_keeps_stale_data_when_offline(mock_get, monkeypatch):
+    with patch("refresh.iter_presidents", return_value=PRESIDENTS):
+        refresh.refresh_database()
+    database.set_metadata({"refreshed_at": 0})
+    # no connection and no cached copy of the page
+    monkeypatch.setattr(scraper, "RESPONSE_CACHE", None)
+    mock_get.side_effect = requests.exceptions.ConnectionError("offline")
+    assert refresh.ensure_fresh() is None
+    assert len(database.fetch_president_names()) == 2
+    # the failed attempt is remembered, so the next call doesn't retry
+    assert not refresh.is_stale()
+    assert refresh.ensure_fresh() is None
+    mock_get.assert_called_once()
+
+@patch("refresh.iter_presidents")
+def test_is_stale_again_after_retry_interval(mock_scrape, monkeypatch):
+    mock_scrape.return_value = []
+    assert refresh.ensure_fresh() is None
+    assert not refresh.is_stale()
+    monkeypatch.setattr(refresh, "RETRY_INTERVAL", 0)
+    assert refresh.is_stale()
+    # a ttl shorter than the retry interval wins
+    monkeypatch.setattr(refresh, "RETRY_INTERVAL", 3600)
+    assert refresh.is_stale(ttl=0)
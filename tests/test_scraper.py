@@ -1,9 +1,18 @@
+import os
+import random
+import re
 import pytest
+import requests
 import scraper
 from bs4 import BeautifulSoup
 from unittest.mock import patch
 
 
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(scraper, "RESPONSE_CACHE", None)
+
+
 @pytest.mark.parametrize("input_text, expected", [
     ("George Washington [1] (President)", "George Washington"),
     ("  Multiple   spaces ", "Multiple spaces"),
@@ -55,22 +64,22 @@ SAMPLE_HTML = """
 """
 
 
-@patch("scraper.requests.get")
+@patch("scraper.http_cache.requests.get")
 def test_scrape_presidents(mock_get):
     mock_get.return_value.status_code = 200
     mock_get.return_value.text = SAMPLE_HTML
     result = scraper.scrape_presidents()
     assert isinstance(result, list)
     assert len(result) == 1
-    assert result[0]["name"] == "George Washington"
-    assert result[0]["birth_death"] == "1732 - 1799"
-    assert result[0]["term"] == "1789 - 1797"
-    assert result[0]["party"] == "None"
-    assert result[0]["election"] == "1788 1792"
-    assert result[0]["vice_president"] == "John Adams"
+    assert result[0].name == "George Washington"
+    assert result[0].birth_death == "1732 - 1799"
+    assert result[0].term == "1789 - 1797"
+    assert result[0].party == "None"
+    assert result[0].election == "1788 1792"
+    assert result[0].vice_president == "John Adams"
 
 
-@patch("scraper.requests.get")
+@patch("scraper.http_cache.requests.get")
 def test_scrape_presidents_with_invalid_html(mock_get):
     mock_get.return_value.status_code = 200
     mock_get.return_value.text = "<html><body><p>No table here!</p></body>"
@@ -87,9 +96,218 @@ MISSING_COLUMNS_HTML = """
 """
 
 
-@patch("scraper.requests.get")
+@patch("scraper.http_cache.requests.get")
 def test_scrape_presidents_missing_columns(mock_get):
     mock_get.return_value.status_code = 200
     mock_get.return_value.text = MISSING_COLUMNS_HTML
     presidents = scraper.scrape_presidents()
     assert presidents == []
+
+
+@patch("scraper.http_cache.requests.get")
+def test_scrape_presidents_uses_response_cache(mock_get, tmp_path,
+                                               monkeypatch):
+    monkeypatch.setattr(scraper, "RESPONSE_CACHE",
+                        scraper.http_cache.FileCache(str(tmp_path)))
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.text = SAMPLE_HTML
+    mock_get.return_value.headers = {}
+    first = scraper.scrape_presidents()
+    second = scraper.scrape_presidents()
+    assert first == second
+    mock_get.assert_called_once()
+
+
+PAGE_HTML = """
+<html><head><title>Presidents</title></head><body>
+<table class="infobox"><tr><td>Not this one</td></tr></table>
+<p>Some text with <a href="#">links</a> and a <br> break.</p>
+""" + SAMPLE_HTML.replace('class="wikitable"', 'class="wikitable sortable"') \
+    + """
+<table class="wikitable"><tr><td>A later table</td></tr></table>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize("backend", sorted(scraper.PARSER_BACKENDS))
+@patch("scraper.http_cache.requests.get")
+def test_scrape_presidents_backends_match(mock_get, backend):
+    if scraper.PARSER_BACKENDS[backend][0] == "lxml":
+        pytest.importorskip("lxml")
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.text = PAGE_HTML
+    expected = scraper.scrape_presidents(backend="html.parser")
+    assert len(expected) == 1
+    assert scraper.scrape_presidents(backend=backend) == expected
+
+
+def test_find_presidents_table_without_table():
+    html = "<html><body><p>No table here!</p></body></html>"
+    assert scraper.find_presidents_table(html) is None
+
+
+# the cleaning functions as they were before the compiled rewrite, kept as
+# the golden reference the current ones must match exactly
+def legacy_clean_text(text):
+    text = re.sub(r'\[.*?\]', '', text)
+    text = text.replace("\u00a0", " ").replace("\u2013", "-")
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'\(.*?\)', '', text)
+    return text.strip() or "N/A"
+
+
+def legacy_clean_vice_president(vp_text):
+    # including the clean_text scrape_presidents used to run first
+    vp_text = legacy_clean_text(vp_text)
+    return legacy_clean_text(re.sub(r'(?<=\D)(\d{4})', r' \1', vp_text))
+
+
+def legacy_extract_birth_death(tag):
+    if not tag:
+        return "N/A"
+    text = tag.get_text(strip=True)
+    match = re.search(r'(b\.)?\s*(\d{4})\s*[\u2013-]?\s*(\d{4})?', text)
+    if match:
+        if match.group(3):
+            return f"{match.group(2)} - {match.group(3)}"
+        return f"born in {match.group(2)}"
+    return "N/A"
+
+
+def legacy_format_term(term):
+    term = term.replace("\u2013", "-")
+    if "-" in term:
+        return " - ".join(part.strip() for part in term.split("-"))
+    return term.strip()
+
+
+def legacy_clean_election(election):
+    election = election.replace("\u00a0", " ").replace("\u2013", " ")
+    return re.sub(r'(\d{4})(?=\d{4})', r'\1 ', election).strip() or "N/A"
+
+
+CLEANERS = [
+    (scraper.clean_text, legacy_clean_text),
+    (scraper.clean_vice_president, legacy_clean_vice_president),
+    (scraper.format_term, legacy_format_term),
+    (scraper.clean_election, legacy_clean_election),
+]
+
+
+def saved_page_cells():
+    # the text of every cell of the saved page, both ways scrape_presidents
+    # reads it
+    with open(SAVED_PAGE, encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    cells = []
+    for cell in soup.find_all(["th", "td"]):
+        cells.append(cell.get_text(strip=True))
+        cells.append(cell.get_text(separator=" "))
+    return cells
+
+
+def fuzz_cells(count=2000, seed=0):
+    # random strings made of the characters the cleaning functions care about
+    rng = random.Random(seed)
+    alphabet = "ab 12[](). -– \n\t"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 24)))
+            for _ in range(count)]
+
+
+SAVED_PAGE = os.path.join(os.path.dirname(__file__), "data",
+                          "presidents_page.html")
+
+
+@pytest.mark.parametrize("cleaner, legacy", CLEANERS,
+                         ids=[legacy.__name__ for _, legacy in CLEANERS])
+def test_cleaning_matches_golden_output(cleaner, legacy):
+    for text in saved_page_cells() + fuzz_cells():
+        assert cleaner(text) == legacy(text), repr(text)
+
+
+def test_extract_birth_death_matches_golden_output():
+    with open(SAVED_PAGE, encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    spans = soup.find_all("span") + [None]
+    for tag in spans:
+        assert (scraper.extract_birth_death(tag)
+                == legacy_extract_birth_death(tag))
+
+
+@patch("scraper.http_cache.requests.get")
+def test_scrape_saved_page(mock_get):
+    with open(SAVED_PAGE, encoding="utf-8") as f:
+        mock_get.return_value.text = f.read()
+    mock_get.return_value.status_code = 200
+    presidents = scraper.scrape_presidents()
+    assert [p.number for p in presidents] == [1, 9, 10, 22, 32, 46, 47]
+    washington, roosevelt = presidents[0], presidents[4]
+    assert washington.name == "George Washington"
+    assert washington.birth_death == "1732 - 1799"
+    assert washington.term == "April 30, 1789 - March 4, 1797"
+    assert washington.party == "Unaffiliated"
+    assert roosevelt.election == "1932 1936 1940 1944"
+    assert roosevelt.vice_president == ("John Nance Garner 1933- 1941 "
+                                           "Henry A. Wallace 1941- 1945 "
+                                           "Harry S. Truman 1945")
+    assert presidents[-1].birth_death == "born in 1946"
+
+
+BAD_ROW_HTML = SAMPLE_HTML.replace("</table>", """
+<tr>
+    <td>2</td><td>No picture</td><td><b>John Adams</b></td><td>1797-1801</td>
+    <td>Federalist</td><td>1796</td><td>Thomas Jefferson</td>
+</tr>
+</table>""")
+
+
+@patch("scraper.http_cache.requests.get")
+def test_iter_presidents_yields_records_lazily(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.text = SAMPLE_HTML
+    presidents = scraper.iter_presidents()
+    mock_get.assert_not_called()  # nothing happens until it is iterated
+    assert next(presidents).name == "George Washington"
+    assert list(presidents) == []
+
+
+@patch("scraper.http_cache.requests.get")
+def test_iter_presidents_yields_row_errors(mock_get, capsys):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.text = BAD_ROW_HTML
+    records = list(scraper.iter_presidents())
+    assert records[0].name == "George Washington"
+    assert records[1] == {"error": "TypeError: 'NoneType' object is not "
+                                   "subscriptable", "row": 2}
+    assert scraper.is_error(records[1])
+    assert capsys.readouterr().out == ""
+    # the list wrapper prints the errors and keeps the good rows
+    assert scraper.scrape_presidents() == records[:1]
+    assert "error: TypeError" in capsys.readouterr().out
+
+
+@patch("scraper.http_cache.cached_get")
+def test_iter_presidents_passes_ttl_to_cache(mock_cached_get):
+    mock_cached_get.return_value.status_code = 500
+    list(scraper.iter_presidents(ttl=0))
+    mock_cached_get.assert_called_once_with(
+        scraper.URL, scraper.RESPONSE_CACHE, ttl=0)
+
+
+@patch("scraper.http_cache.requests.get")
+def test_iter_presidents_page_errors(mock_get):
+    mock_get.return_value.status_code = 500
+    assert list(scraper.iter_presidents()) == [
+        {"error": "Failed to retrieve data", "row": None}]
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.text = "<html><body></body></html>"
+    assert list(scraper.iter_presidents()) == [
+        {"error": "Could not find the presidents table.", "row": None}]
+
+
+@patch("scraper.http_cache.requests.get")
+def test_iter_presidents_connection_error(mock_get):
+    mock_get.side_effect = requests.exceptions.ConnectionError("offline")
+    assert list(scraper.iter_presidents()) == [
+        {"error": "Failed to retrieve data: ConnectionError: offline",
+         "row": None}]
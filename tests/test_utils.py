@@ -1,6 +1,10 @@
 from unittest.mock import patch
+import pytest
+import time
 import pandas as pd
 from utils import parse_term_dates, display_chatbot, calculate_durations
+from utils import parse_term_series
+from utils import parse_election_years, parse_vice_presidents
 
 
 def test_parse_term_dates_with_years_only():
@@ -109,3 +113,91 @@ def test_calculate_durations():
     assert george_washington["Start"].iloc[0] == 1789
     assert george_washington["End"].iloc[0] == 1797
     assert george_washington["Years in Office"].iloc[0] == 8
+
+
+def test_calculate_durations_from_term_columns():
+    df = pd.DataFrame({
+        "name": ["George Washington", "Unknown", "Donald Trump"],
+        "term": ["April 30, 1789 - March 4, 1797", "N/A",
+                 "January 20, 2025 - Incumbent"],
+        "term_start": ["1789-04-30", None, "2025-01-20"],
+        "term_end": ["1797-03-04", None, None],
+        "is_incumbent": [0, 0, 1]
+    })
+    with patch("utils.parse_term_dates") as mock_parse:
+        result_df = calculate_durations(df)
+    mock_parse.assert_not_called()
+    assert result_df["Name"].tolist() == ["George Washington", "Donald Trump"]
+    assert result_df["Start"].tolist() == [1789, 2025]
+    assert result_df["End"].tolist() == [1797, 2026]
+    assert result_df["Years in Office"].tolist() == [8, 1]
+
+
+def test_parse_term_series_matches_parse_term_dates():
+    terms = pd.Series(["April 30, 1789 - March 4, 1797",
+                       "March 4, 1841 - April 4, 1841",
+                       "Sept 19, 1881 - March 4, 1885",
+                       "January 20, 2025 - Incumbent"])
+    start, end = parse_term_series(terms)
+    for term, start_date, end_date in zip(terms, start, end):
+        assert (start_date, end_date) == parse_term_dates(term)
+
+
+def test_parse_term_series_unreadable_terms():
+    start, end = parse_term_series(pd.Series(["N/A", "1913 - 1921"]))
+    assert start.isna().tolist() == [True, False]
+    assert end.isna().tolist() == [True, False]
+    assert (start[1].year, end[1].year) == (1913, 1921)
+
+
+@pytest.mark.parametrize("terms", [[], ["N/A", "N/A"]])
+def test_calculate_durations_without_readable_terms(terms):
+    df = pd.DataFrame({"name": [f"President {i}" for i in range(len(terms))],
+                       "term": terms})
+    result_df = calculate_durations(df)
+    assert result_df.empty
+    assert list(result_df.columns) == ["Name", "Start", "End",
+                                       "Years in Office"]
+
+
+def test_calculate_durations_100k_rows_is_fast():
+    df = pd.DataFrame({
+        "name": [f"President {i}" for i in range(100_000)],
+        "term": [f"March {i % 28 + 1}, {1789 + i % 230} - "
+                 f"March 4, {1793 + i % 230}" for i in range(100_000)]
+    })
+    start = time.perf_counter()
+    result_df = calculate_durations(df)
+    # the old row-by-row version took well over half a minute
+    assert time.perf_counter() - start < 10
+    assert len(result_df) == 100_000
+    assert (result_df["Years in Office"] == 4).all()
+
+
+@pytest.mark.parametrize("election, expected", [
+    ("1788 891792", [1788, 1792]),
+    ("1932 1936 1940 1944", [1932, 1936, 1940, 1944]),
+    ("20082012", [2008, 2012]),
+    ("N/A", []),
+    (None, []),
+])
+def test_parse_election_years(election, expected):
+    assert parse_election_years(election) == expected
+
+
+@pytest.mark.parametrize("vice_president, expected", [
+    ("John Adams", [("John Adams", 1789, 1797)]),
+    ("Office vacant", []),
+    ("N/A", []),
+    # Hendricks died in office and the vacancy ran to the end of the term
+    ("Thomas A. Hendricks Office vacant 1885- 1889",
+     [("Thomas A. Hendricks", 1789, 1885)]),
+    ("Office vacant 1789- 1790 John Adams",
+     [("John Adams", 1790, 1797)]),
+    ("John Nance Garner 1933- 1941 Henry A. Wallace 1941- 1945 "
+     "Harry S. Truman 1945",
+     [("John Nance Garner", 1933, 1941), ("Henry A. Wallace", 1941, 1945),
+      ("Harry S. Truman", 1945, 1945)]),
+])
+def test_parse_vice_presidents(vice_president, expected):
+    assert parse_vice_presidents(vice_president, 1789, 1797) == expected
@@ -1,8 +1,20 @@
 from dateutil import parser
+import re
 import streamlit as st
 from openai import AzureOpenAI
 import pandas as pd
 
+# placeholder end date for a term that is still going on
+INCUMBENT_END = "2026-01-01"
+# the date formats found in terms, e.g. "April 30, 1789" or "1789"
+TERM_DATE_FORMATS = ("%B %d, %Y", "%Y")
+# a year, or a range of years, after a vice president's name
+YEAR_RANGE_RE = re.compile(r"(\d{4})(?:\s*-\s*(\d{4}))?")
+# vice president texts that aren't anyone's name
+NO_VICE_PRESIDENT = ("Office vacant", "N/A")
+VACANCY_RE = re.compile(
+    "(" + "|".join(re.escape(label) for label in NO_VICE_PRESIDENT) + ")")
+
 
 def parse_term_dates(term, just_years=False):
     """Converts a president's term string into dates"""
@@ -13,7 +25,7 @@ def parse_term_dates(term, just_years=False):
 
     # if the term is still going on
     if "Incumbent" in end_str.strip():
-        end = parser.parse("2026-01-01")  # placeholder date for ongoing term
+        end = parser.parse(INCUMBENT_END)  # placeholder date for ongoing term
     else:
         end = parser.parse(end_str.strip())  # parse end date normally
     # if the user set just_years to true
@@ -22,6 +34,61 @@ def parse_term_dates(term, just_years=False):
     return start, end  # return full dates
 
 
+def parse_election_years(election):
+    """Get the election years out of a scraped election, e.g. "1788 891792"
+    ("1788-89" and "1792" run together) gives [1788, 1792]."""
+    years = []
+    for run in re.findall(r"\d+", election or ""):
+        # split runs of several years from the right, so the "89" left
+        # over from "1788-89" is dropped
+        chunks = [int(run[end - 4:end]) for end in range(len(run), 3, -4)]
+        for year in reversed(chunks):
+            if year not in years:
+                years.append(year)
+    return years
+
+
+def _vice_president_name(text):
+    return " ".join(text.split()).strip(" -,")
+
+
+def parse_vice_presidents(vice_president, start_year=None, end_year=None):
+    """Split a scraped vice president text into (name, start year, end
+    year) tuples, e.g. "John Nance Garner 1933- 1941 Henry A. Wallace
+    1941- 1945". A name without years runs from where the one before it
+    ended (or start_year) to where the next one starts (or end_year). A
+    vacancy takes the years after it like a name but isn't returned."""
+    text = vice_president or ""
+    # [name, start, end] in order, with None as the name of a vacancy
+    entries = []
+    position = 0
+    for match in [*YEAR_RANGE_RE.finditer(text), None]:
+        segment = text[position:match.start() if match else len(text)]
+        for part in VACANCY_RE.split(segment):
+            if part in NO_VICE_PRESIDENT:
+                entries.append([None, None, None])
+            elif _vice_president_name(part):
+                entries.append([_vice_president_name(part), None, None])
+        # the year(s) belong to the name or vacancy just before them
+        if match and entries and entries[-1][1] is None:
+            start = int(match.group(1))
+            entries[-1][1:] = [start, int(match.group(2) or start)]
+        if match:
+            position = match.end()
+
+    vice_presidents = []
+    for index, (name, start, end) in enumerate(entries):
+        if start is None:
+            before = entries[index - 1][2] if index else None
+            after = entries[index + 1][1] if index + 1 < len(entries) \
+                else None
+            start = before if before is not None else start_year
+            end = after if after is not None else end_year
+        if name:
+            vice_presidents.append((name, start, end))
+    return vice_presidents
+
+
 def display_chatbot(president_name, need_hint=False):
     """Make a chatbot to get more information about a president or give a hint"""
     # if the user entered an API key, initialize the Azure OpenAI client
@@ -57,21 +124,71 @@ def display_chatbot(president_name, need_hint=False):
         st.write_stream(stream)  # display the streamed response in the UI
 
 
+def parse_term_series(terms):
+    """Vectorized parse_term_dates for a whole column of terms. Returns
+    start and end datetime Series, with NaT where a term can't be read"""
+    # split every term at the first "-" into start and end strings, kept
+    # as strings even when no term has a "-" (or there are no terms)
+    parts = terms.astype("string").str.split("-", n=1, expand=True)
+    parts = parts.reindex(columns=[0, 1]).astype("string")
+    start_str = parts[0].str.strip()
+    end_str = parts[1].str.strip()
+    incumbent = end_str.str.contains("Incumbent", na=False)
+
+    start = _parse_date_series(start_str)
+    end = _parse_date_series(end_str.mask(incumbent))
+    end = end.mask(incumbent, pd.Timestamp(INCUMBENT_END))
+    return start, end
+
+
+def _parse_date_series(dates):
+    """parse a column of date strings with the known formats, falling
+    back to dateutil only for the rare strings none of them match"""
+    parsed = pd.Series(pd.NaT, index=dates.index, dtype="datetime64[ns]")
+    for date_format in TERM_DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(
+            dates[missing], format=date_format, errors="coerce")
+    leftover = parsed.isna() & dates.notna()
+    if leftover.any():
+        parsed[leftover] = dates[leftover].map(_parse_date_or_nat)
+    return parsed
+
+
+def _parse_date_or_nat(text):
+    # dateutil fallback for a single unusual date string
+    try:
+        return parser.parse(text)
+    except (ValueError, OverflowError):
+        return pd.NaT
+
+
+def term_dates(df):
+    """start and end datetime Series for each row of a presidents
+    DataFrame, read from the stored term columns when it has them"""
+    if "term_start" in df.columns:
+        # the term dates were already parsed when the data was stored
+        start = pd.to_datetime(df["term_start"], format="%Y-%m-%d")
+        end = pd.to_datetime(df["term_end"].fillna(INCUMBENT_END),
+                             format="%Y-%m-%d")
+        return start, end.mask(start.isna())
+    return parse_term_series(df["term"])
+
+
 def calculate_durations(df):
     """calculates the durations of a presidency"""
-    durations = []  # list to store one dictionary per president
-    # loop through each row of the dataframe
-    for _, row in df.iterrows():
-        # get start and end years of the term
-        start, end = parse_term_dates(row["term"], True)
-        if start and end:
-            # create a dictionary with president's name, term years, and
-            # duration
-            durations.append({
-                "Name": row["name"],
-                "Start": start,
-                "End": end,
-                "Years in Office": end - start  # subtract to get num of years
-            })
-    # converts the list of dictionaries to a dataframe
-    return pd.DataFrame(durations)
+    # get start and end years of every term at once
+    start, end = term_dates(df)
+    known = start.notna() & end.notna()
+    start = start[known].dt.year.astype("int64")
+    end = end[known].dt.year.astype("int64")
+    # create a dataframe with each president's name, term years, and
+    # duration
+    return pd.DataFrame({
+        "Name": df["name"][known],
+        "Start": start,
+        "End": end,
+        "Years in Office": end - start  # subtract to get num of years
+    }).reset_index(drop=True)